@@ -1,4 +1,5 @@
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,13 +41,16 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
+    'documents.metrics.RequestMetricsMiddleware',
+    'documents.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates з підрахунком часу рендеру для метрик запитів
+        'BACKEND': 'documents.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -69,6 +73,20 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Транзакції одразу беруть блокування на запис: масові дії, архівування й посилання
+            # на блоби спершу читають, а потім пишуть, і в режимі DEFERRED підвищення блокування
+            # падало б з SQLITE_BUSY без очікування. WAL дозволяє читати під час запису,
+            # timeout — скільки чекати на блокування
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;',
+            'timeout': 20,
+        },
+        # Тестова база у файлі, а не в пам'яті: так тести конкурентного доступу
+        # перевіряють справжні блокування SQLite
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -110,8 +128,131 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Рядки списку вхідних: обмежений LRU у пам'яті процесу — читання переносить запис
+    # у кінець черги, а при переповненні видаляється 1/CULL_FREQUENCY найдавніших
+    'rows': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'document-rows',
+        'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 10},
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/documents/incoming/'  # Після логіну — на вхідні заявки
 LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# Токен для пакетного API створення заявок (documents/ingest/); порожній — API вимкнено
+DOCUMENTS_INGEST_TOKEN = os.environ.get('DOCUMENTS_INGEST_TOKEN', '')
+
+# Кеш довідника департаментів: аліас з CACHES для спільного кешу між воркерами
+# (None — лише пам'ять процесу) та час життя локальної копії без спільного кешу, сек
+DOCUMENTS_DEPARTMENT_CACHE = None
+DOCUMENTS_DEPARTMENT_CACHE_TTL = 60
+
+# Кеш сторінок списку вхідних: аліас з CACHES (None — вимкнено) та час життя сторінки, сек.
+# Для кількох воркерів потрібен спільний кеш, інакше зміни з інших процесів видно лише після TTL
+DOCUMENTS_INBOX_CACHE = 'default'
+DOCUMENTS_INBOX_CACHE_TTL = 15
+
+# Кеш відрендерених рядків списку вхідних (rowcache.py): аліас з CACHES (None — вимкнено)
+# та час життя рядка, сек. Ключ містить версію заявки, тож TTL лише обмежує вік записів
+DOCUMENTS_ROW_CACHE = 'rows'
+DOCUMENTS_ROW_CACHE_TTL = 24 * 60 * 60
+
+# Метрики запитів (documents/metrics.py): скільки останніх запитів кожного маршруту тримати
+# для агрегатів і чи додавати заголовок Server-Timing
+DOCUMENTS_METRICS_WINDOW = 500
+DOCUMENTS_SERVER_TIMING = True
+# Бюджети SQL-запитів за іменем маршруту — задуманий склад запитів, а не виміряний.
+# У кожен входять сесія та користувач (2); "реєстр" — довідник департаментів (registry.py),
+# який читається з бази лише після скидання кешу. Перевищення — попередження в лог,
+# з DOCUMENTS_QUERY_BUDGET_STRICT — помилка (так працюють тести documents)
+DOCUMENTS_QUERY_BUDGETS = {
+    # ETag (остання активність, кількість заявок) + сторінка + реєстр;
+    # пошук за ідентифікатором — ще перевірка, чи є ключі з таким початком
+    'documents:incoming_list': 7,
+    # ETag + заявка + коментарі + історія + попередні звернення клієнта + реєстр
+    'documents:document_detail': 8,
+    # Сторінка коментарів / історії
+    'documents:document_comments': 3,
+    'documents:document_history': 3,
+    # Заявка + транзакція (BEGIN, коментар, лічильник, COMMIT)
+    'documents:add_comment': 7,
+    # Заявка + транзакція (BEGIN, умовний UPDATE ... RETURNING, лічильники стану, денні
+    # лічильники — лише при закритті, перехід, історія, COMMIT) + реєстр для фрагмента відповіді
+    'documents:update_status': 11,
+    'documents:update_department': 10,
+    'documents:close_document': 10,
+    # Транзакція над вибраними заявками, як в update_status, без заявки окремо;
+    # реєстр читає лише зміна департаменту, денні лічильники — лише закриття
+    'documents:bulk_action': 10,
+    # Лічильники стану + денні лічильники + реєстр
+    'documents:dashboard': 5,
+    # Заявки під загрозою порушення SLA
+    'documents:sla_at_risk': 3,
+    # Заявка + файли
+    'documents:document_files': 4,
+    # Заявка + транзакція (BEGIN, посилання на блоб у точці збереження — до 6, вкладення,
+    # лічильник, задача обробки, COMMIT) + файли
+    'documents:upload_file': 15,
+    # Заявка + сесія / сесія + дописування
+    'documents:upload_start': 4,
+    'documents:upload_chunk': 5,
+    # Сесія із заявкою і користувачем + транзакція вкладення, як в upload_file + видалення сесії
+    'documents:upload_complete': 15,
+    # Вкладення із заявкою + транзакція (BEGIN, свіжа мініатюра, вкладення, посилання на блоб
+    # у точці збереження, пошуковий індекс, лічильник, COMMIT) + перевірка останнього посилання
+    # після коміту + файли
+    'documents:delete_file': 17,
+    # Вкладення
+    'documents:download_file': 3,
+    # Сторінка архіву + реєстр
+    'documents:archive_list': 4,
+    # Заявка з автором і департаментом + коментарі + історія + файли
+    'documents:archive_detail': 6,
+}
+DOCUMENTS_QUERY_BUDGET_STRICT = False
+
+# Профілювання запитів (documents/profiling.py). Вимкнене — middleware не бере участі в запитах.
+# Увімкнене профілює запити персоналу з X-Profile: 1 або ?_profile=1 та в середньому кожен N-й
+# запит (DOCUMENTS_PROFILE_SAMPLE_RATE, 0 — без вибірки); зберігаються останні KEEP профілів
+DOCUMENTS_PROFILING = os.environ.get('DOCUMENTS_PROFILING') == '1'
+DOCUMENTS_PROFILE_SAMPLE_RATE = int(os.environ.get('DOCUMENTS_PROFILE_SAMPLE_RATE') or 0)
+DOCUMENTS_PROFILE_DIR = BASE_DIR / 'profiles'
+DOCUMENTS_PROFILE_KEEP = 200
+
+# Максимальна кількість заявок в одній масовій дії зі списку вхідних
+DOCUMENTS_BULK_ACTION_LIMIT = 500
+
+# Віддача файлів заявок: None — потоком з Django, 'x-accel' — через nginx (X-Accel-Redirect
+# на internal-локацію DOCUMENTS_FILE_ACCEL_PREFIX, що дивиться в MEDIA_ROOT), 'x-sendfile' — Apache/lighttpd
+DOCUMENTS_FILE_OFFLOAD = os.environ.get('DOCUMENTS_FILE_OFFLOAD') or None
+DOCUMENTS_FILE_ACCEL_PREFIX = '/protected-media/'
+
+# Завантаження файлів частинами: максимальний розмір файлу та однієї частини (байти),
+# час життя сесії без активності (сек) і каталог тимчасових файлів (None — MEDIA_ROOT/uploads/partial)
+DOCUMENTS_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+DOCUMENTS_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOCUMENTS_UPLOAD_SESSION_TTL = 24 * 60 * 60
+DOCUMENTS_UPLOAD_DIR = None
+
+# Перевірка вкладень на віруси у фоновій обробці: dotted path до функції (шлях до файлу) -> True, якщо файл чистий.
+# None — перевірка не виконується
+DOCUMENTS_SCAN_HOOK = os.environ.get('DOCUMENTS_SCAN_HOOK') or None
+
+# Нормативи SLA в годинах: реакція (перший перехід зі статусу «Новий») та вирішення
+# за типом звернення; відсутні значення беруться з 'default'
+DOCUMENTS_SLA = {
+    'default': {'response': 4, 'resolution': 72},
+    'bug': {'response': 2, 'resolution': 24},
+    'access': {'response': 1, 'resolution': 8},
+}
+
+# Закриті заявки без активності довше цієї кількості днів команда archive_documents переносить в архів
+DOCUMENTS_ARCHIVE_AFTER_DAYS = 180
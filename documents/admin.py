@@ -1,6 +1,30 @@
 # documents/admin.py
 from django.contrib import admin
-from .models import Department, Document
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from . import profiling, rollups
+from .forms import DepartmentChoiceField
+from .models import Department, Document, DocumentTransition, Job, RequestProfile
+from .registry import departments
+
+
+class DepartmentListFilter(admin.SimpleListFilter):
+    """Фільтр за департаментом зі списком з кешу довідника"""
+    title = 'Департамент'
+    parameter_name = 'department__id__exact'
+
+    def lookups(self, request, model_admin):
+        return departments.choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(department_id=self.value())
+        return queryset
+
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
@@ -10,6 +34,76 @@ class DepartmentAdmin(admin.ModelAdmin):
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ('identifier', 'full_name', 'created_at', 'status', 'department')
-    list_filter = ('status', 'department', 'channel', 'request_type')
+    list_filter = ('status', DepartmentListFilter, 'channel', 'request_type')
+    list_select_related = ('department',)
     search_fields = ('identifier', 'full_name')
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+    def save_model(self, request, obj, form, change):
+        # Зміни з адмінки йдуть в обхід сервісів, тож лічильники дашборду та журнал переходів ведемо тут
+        before = Document.objects.filter(pk=obj.pk).values(*rollups.DIMENSIONS).first() if change else None
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if before is not None:
+                after = {field: getattr(obj, field) for field in rollups.DIMENSIONS}
+                rollups.record_transitions([before], after)
+                if (before['status'], before['department_id']) != (after['status'], after['department_id']):
+                    DocumentTransition.objects.create(
+                        document=obj, user=request.user,
+                        from_status=before['status'], to_status=after['status'],
+                        from_department=before['department_id'], to_department=after['department_id'],
+                    )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'department':
+            kwargs['form_class'] = DepartmentChoiceField
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'view_name', 'filters', 'duration_ms', 'queries', 'status_code', 'trigger', 'user', 'file_link')
+    list_filter = ('trigger', 'view_name')
+    list_select_related = ('user',)
+    search_fields = ('path', 'filters')
+    date_hierarchy = 'created_at'
+    fields = ('created_at', 'view_name', 'path', 'filters', 'user', 'trigger', 'status_code',
+              'duration_ms', 'queries', 'file_link', 'summary_text')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='documents_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            file = open(profiling.profile_path(profile), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(file, as_attachment=True, filename=profile.filename)
+
+    @admin.display(description="Файл pstats")
+    def file_link(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse('admin:documents_requestprofile_download', args=[obj.pk]), obj.filename)
+
+    @admin.display(description="Найдовші виклики")
+    def summary_text(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
@@ -0,0 +1,145 @@
+# documents/archive.py
+"""
+Перенесення закритих заявок в архівні таблиці та повернення з архіву.
+
+Заявка разом з коментарями, історією, журналом переходів і вкладеннями переноситься
+пачками: кожна пачка — INSERT ... SELECT і DELETE у власній транзакції, тож перервана
+команда archive_documents просто продовжить з наступної пачки. Видалення йде SQL-запитами,
+а не через ORM: сигнали post_delete зняли б посилання на файли в сховищі блобів
+і зменшили б лічильники дашборду, а файли переходять в архів разом із заявкою.
+Архівні заявки не входять у DocumentStateRollup (дашборд показує робочі заявки);
+кеш списку вхідних (listcache.py) скидається явно.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import listcache, rollups, uploads
+from .models import (
+    ArchivedAttachment, ArchivedComment, ArchivedDocument, ArchivedHistory, ArchivedTransition,
+    Attachment, Comment, Document, DocumentHistory, DocumentTransition, UploadSession,
+)
+from .search import get_search_backend
+
+BATCH_SIZE = 500
+
+# Дочірні таблиці заявки: пари (робоча модель, архівна модель)
+CHILDREN = [
+    (Comment, ArchivedComment),
+    (DocumentHistory, ArchivedHistory),
+    (DocumentTransition, ArchivedTransition),
+    (Attachment, ArchivedAttachment),
+]
+
+
+def archive_after():
+    return timedelta(days=getattr(settings, 'DOCUMENTS_ARCHIVE_AFTER_DAYS', 180))
+
+
+def _copy(source, target, column, ids):
+    """INSERT INTO target SELECT ... FROM source WHERE column IN ids — лише спільні колонки"""
+    quote = connection.ops.quote_name
+    source_columns = {field.column for field in source._meta.concrete_fields}
+    columns = ', '.join(quote(field.column) for field in target._meta.concrete_fields if field.column in source_columns)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(target._meta.db_table)} ({columns}) "
+            f"SELECT {columns} FROM {quote(source._meta.db_table)} WHERE {quote(column)} IN ({placeholders})",
+            ids,
+        )
+
+
+def _delete(model, column, ids):
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})", ids)
+
+
+def _move(documents, children, ids):
+    """
+    Переносить заявки ids між парами таблиць (звідки, куди): спочатку заявку, потім дочірні
+    рядки, видалення — у зворотному порядку, щоб зовнішні ключі завжди мали на що посилатися
+    """
+    source, target = documents
+    _copy(source, target, 'id', ids)
+    for child_source, child_target in children:
+        _copy(child_source, child_target, 'document_id', ids)
+    for child_source, _ in children:
+        _delete(child_source, 'document_id', ids)
+    _delete(source, 'id', ids)
+
+
+def candidates(older_than=None, now=None):
+    """Закриті заявки без активності довше older_than (за замовчуванням DOCUMENTS_ARCHIVE_AFTER_DAYS)"""
+    cutoff = (now or timezone.now()) - (older_than or archive_after())
+    return Document.objects.filter(is_closed=True, status='closed', last_activity_at__lt=cutoff)
+
+
+def archive_batch(ids):
+    """Переносить заявки ids в архів; повертає кількість перенесених"""
+    with transaction.atomic():
+        # Повторна перевірка під блокуванням: заявку могли відкрити після вибірки кандидатів
+        rows = list(
+            Document.objects.select_for_update()
+            .filter(pk__in=ids, is_closed=True)
+            .values('pk', *rollups.DIMENSIONS)
+        )
+        ids = [row['pk'] for row in rows]
+        if not ids:
+            return 0
+        attachment_ids = list(Attachment.objects.filter(document_id__in=ids).values_list('pk', flat=True))
+        for session in UploadSession.objects.filter(document_id__in=ids):
+            uploads.discard(session)
+
+        _move((Document, ArchivedDocument), CHILDREN, ids)
+
+        backend = get_search_backend()
+        backend.remove(ids)
+        for attachment_id in attachment_ids:
+            backend.remove_attachment(attachment_id)
+        rollups.apply(Counter({key: -count for key, count in Counter(map(rollups.state_key, rows)).items()}))
+        listcache.invalidate()
+    return len(ids)
+
+
+def archive(older_than=None, batch_size=BATCH_SIZE, limit=None, now=None):
+    """
+    Переносить кандидатів пачками по batch_size (не більше limit заявок); генерує
+    кількість перенесених після кожної пачки
+    """
+    queryset = candidates(older_than, now).order_by('pk').values_list('pk', flat=True)
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        ids = list(queryset[:size])
+        if not ids:
+            return
+        moved += archive_batch(ids)
+        yield moved
+
+
+def restore(ids):
+    """Повертає заявки ids з архіву в робочі таблиці; повертає кількість повернених"""
+    with transaction.atomic():
+        ids = list(ArchivedDocument.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if not ids:
+            return 0
+        _move((ArchivedDocument, Document), [(target, source) for source, target in CHILDREN], ids)
+        # Повернення — це активність: інакше заявка знову пройде за candidates() і наступний
+        # запуск archive_documents одразу перенесе її назад
+        Document.objects.filter(pk__in=ids).update(last_activity_at=timezone.now())
+
+        documents = list(Document.objects.filter(pk__in=ids))
+        backend = get_search_backend()
+        backend.index(documents)
+        attachments = Attachment.objects.filter(document_id__in=ids).exclude(text='')
+        for attachment_id, document_id, text in attachments.values_list('pk', 'document_id', 'text'):
+            backend.index_attachment(attachment_id, document_id, text)
+        rollups.apply(Counter(map(rollups.state_key, documents)))
+        listcache.invalidate()
+    return len(ids)
@@ -0,0 +1,81 @@
+# documents/clients.py
+"""
+Нормалізований ключ клієнта з вільного тексту Document.identifier.
+
+Ключ — лише цифри; номер телефону в національному форматі (0XX...) або старому міжнародному
+(80XX...) приводиться до 380XXXXXXXXX, тож «050 111-22-33», «+380501112233» і «0501112233» дають
+один ключ. ІПН (10 цифр) і код ЄДРПОУ (8 цифр) лишаються як є; ІПН, що починається з 0,
+неможливо відрізнити від телефону — він теж отримає префікс 380, але однаково для всіх заявок.
+Ключ заповнюється в Document.save() та в ingest, для наявних заявок — міграцією 0019;
+команда fill_client_keys перераховує його повторно (наприклад, після зміни правил нормалізації).
+"""
+import re
+
+from django.db.models import Q
+
+NON_DIGITS = re.compile(r'\D')
+COUNTRY_CODE = '380'
+PREVIOUS_LIMIT = 10
+
+
+def client_key(identifier):
+    digits = NON_DIGITS.sub('', identifier or '')
+    if len(digits) == 10 and digits.startswith('0'):
+        return COUNTRY_CODE + digits[1:]
+    if len(digits) == 11 and digits.startswith('80'):
+        return '3' + digits
+    return digits
+
+
+def key_prefixes(query):
+    """Можливі початки ключа для частково введеного ідентифікатора"""
+    digits = NON_DIGITS.sub('', query or '')
+    if not digits:
+        return []
+    prefixes = [digits]
+    if digits.startswith('0'):
+        prefixes.append('38' + digits)
+    elif digits.startswith('80'):
+        prefixes.append('3' + digits)
+    return prefixes
+
+
+def prefix_filter(query, field='client_key'):
+    """
+    Умова «ключ починається з» як діапазон [префікс, наступний префікс): на відміну від LIKE
+    (у SQLite він нечутливий до регістру) діапазон іде по індексу в будь-якій базі.
+    Повертає None, якщо в запиті немає цифр
+    """
+    prefixes = key_prefixes(query)
+    if not prefixes:
+        return None
+    condition = Q()
+    for prefix in prefixes:
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        condition |= Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+    return condition
+
+
+def substring_filter(query, field='client_key'):
+    """
+    Умова «ключ або сам identifier містить запит» — для частини номера з середини чи кінця.
+    Іде повним переглядом, тож лише як запасний варіант після prefix_filter
+    """
+    condition = Q(identifier__icontains=query)
+    digits = NON_DIGITS.sub('', query or '')
+    if digits:
+        condition |= Q(**{f'{field}__contains': digits})
+    return condition
+
+
+def previous_documents(document, limit=PREVIOUS_LIMIT):
+    """Інші заявки того самого клієнта, найновіші спочатку — один запит по індексу client_key"""
+    from .models import Document
+    if not document.client_key:
+        return Document.objects.none()
+    return (
+        Document.objects.filter(client_key=document.client_key)
+        .exclude(pk=document.pk)
+        .select_related('department')
+        .order_by('-created_at', '-id')[:limit]
+    )
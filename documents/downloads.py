@@ -0,0 +1,135 @@
+# documents/downloads.py
+"""
+Віддача файлів заявок лише авторизованим користувачам.
+
+Підтримуються умовні запити (ETag/Last-Modified -> 304) та один діапазон Range (206),
+щоб великі PDF можна було докачувати. Якщо задано DOCUMENTS_FILE_OFFLOAD ('x-accel' для nginx
+або 'x-sendfile' для Apache/lighttpd), Django лише перевіряє доступ, а байти віддає проксі.
+Вбудовано (inline) показуються лише зображення та PDF з INLINE_TYPES; решта, зокрема HTML і SVG,
+що виконувалися б на домені застосунку з cookie сесії, завжди віддається як вкладення, а
+X-Content-Type-Options: nosniff не дає браузеру вгадувати інший тип.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from .storage import is_blob_name
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+INLINE_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/bmp', 'application/pdf'}
+
+
+def file_etag(name, size, modified):
+    # Ім'я блоба — це хеш вмісту, тож ETag сильний і не залежить від часу зміни файлу
+    if is_blob_name(name):
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return 'W/' + quote_etag(f'{size:x}-{int(modified.timestamp()):x}')
+
+
+def parse_range(header, size):
+    """Повертає (start, end) включно, None — якщо заголовка немає або він не підтримується, False — якщо діапазон поза файлом"""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N — останні N байтів
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(storage, name):
+    mode = getattr(settings, 'DOCUMENTS_FILE_OFFLOAD', None)
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'DOCUMENTS_FILE_ACCEL_PREFIX', '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = storage.path(name)
+        return response
+    return None
+
+
+def serve_file(request, field_file, filename=None, as_attachment=False):
+    storage, name = field_file.storage, field_file.name
+    filename = filename or os.path.basename(name)
+    size = storage.size(name)
+    modified = storage.get_modified_time(name)
+    etag = file_etag(name, size, modified)
+    last_modified = http_date(modified.timestamp())
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=parse_http_date_safe(last_modified),
+    )
+    if response is None:
+        response = offload_response(storage, name)
+    if response is None:
+        response = stream_file(request, storage, name, size, etag, last_modified)
+
+    if response.status_code not in (304, 412, 416):
+        content_type, encoding = mimetypes.guess_type(filename)
+        if not content_type:
+            content_type, encoding = mimetypes.guess_type(name)
+        content_type = content_type or 'application/octet-stream'
+        response['Content-Type'] = content_type
+        response['Content-Disposition'] = content_disposition_header(
+            as_attachment or content_type not in INLINE_TYPES, filename,
+        )
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def stream_file(request, storage, name, size, etag, last_modified):
+    byte_range = parse_range(request.headers.get('Range'), size)
+
+    # If-Range: діапазон віддаємо лише якщо файл не змінився, інакше — весь файл
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != last_modified and (if_range != etag or etag.startswith('W/')):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(storage.open(name))
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(iter_range(storage.open(name), start, length), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,83 @@
+# documents/etags.py
+"""
+ETag для умовних GET сторінки заявки та списку вхідних (django.views.decorators.http.condition).
+
+Версія рахується до основних запитів представлення: якщо браузер надіслав той самий
+If-None-Match, повертається 304 без вибірки коментарів, історії, сторінки списку та рендеру.
+До ETag входять також користувач, секрет CSRF (сторінки містять токен), HX-Request
+(одна адреса віддає і фрагмент, і повну сторінку) та довідник департаментів (меню фільтрів).
+"""
+import hashlib
+
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from . import listcache
+from .models import Attachment, Comment, Document, DocumentHistory, DocumentStateRollup
+from .registry import departments
+
+
+def _etag(request, *parts):
+    common = (
+        request.user.pk,
+        request.META.get('CSRF_COOKIE', ''),
+        bool(request.headers.get('HX-Request')),
+        tuple((department.pk, department.name) for department in departments.all()),
+    )
+    return hashlib.sha1(repr(common + parts).encode()).hexdigest()
+
+
+def _latest(model, field):
+    return Subquery(
+        model.objects.filter(document=OuterRef('pk')).order_by()
+        .values('document').annotate(at=Max(field)).values('at')
+    )
+
+
+def document(request, pk):
+    """
+    Версія сторінки заявки — один запит: поля заявки, останні коментар/запис історії/файл
+    та остання активність інших заявок клієнта (блок попередніх звернень)
+    """
+    client_activity = Subquery(
+        Document.objects.filter(client_key=OuterRef('client_key'), client_key__gt='').order_by()
+        .values('client_key').annotate(at=Max('last_activity_at')).values('at')
+    )
+    row = (
+        Document.objects.filter(pk=pk)
+        .values_list(
+            'updated_at', 'last_activity_at', 'comments_count', 'attachments_count',
+            'status', 'department_id', 'is_closed',
+        )
+        .annotate(
+            comment_at=_latest(Comment, 'created_at'),
+            history_at=_latest(DocumentHistory, 'created_at'),
+            attachment_at=_latest(Attachment, 'uploaded_at'),
+            client_at=client_activity,
+        )
+        .first()
+    )
+    # Немає заявки — без ETag, представлення саме поверне 404
+    return _etag(request, 'document', row) if row is not None else None
+
+
+def inbox(request):
+    """
+    Водяний знак списку вхідних: покоління кешу сторінок (скидається будь-яким записом у Document
+    цього процесу), найпізніші активність і зміна заявок (кінці індексів doc_activity_id_idx
+    і doc_updated_idx — їх рухають і записи з інших воркерів та адмінки) та кількість заявок
+    з лічильників дашборду — вона змінюється при видаленні й архівуванні в інших процесах
+    """
+    latest_change = Document.objects.order_by('-updated_at').values('updated_at')[:1]
+    watermark = (
+        Document.objects.order_by('-last_activity_at', '-id')
+        .values_list('last_activity_at')
+        .annotate(updated_at=Subquery(latest_change))
+        .first()
+    )
+    total = DocumentStateRollup.objects.aggregate(total=Sum('count'))['total']
+    # Відносні фільтри дат ("сьогодні") змінюють зміст опівночі
+    return _etag(
+        request, 'inbox', listcache.normalize(request.GET), listcache.generation(),
+        watermark, total, timezone.localdate(),
+    )
@@ -0,0 +1,137 @@
+# documents/events.py
+"""
+Події змін заявок для живого оновлення сторінок через Server-Sent Events.
+
+Сервіси після коміту публікують невелику подію (тип, id заявки). Шина живе в пам'яті процесу:
+її слухають SSE-з'єднання (views.document_events) цього ж ASGI-процесу, кожне — через власну
+asyncio-чергу. HTML-фрагменти для події рендеряться лише раз, при першій відправці, і лише
+якщо є слухачі. При кількох процесах кожен бачить лише свої події.
+"""
+import asyncio
+import threading
+
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from . import rowcache
+from .registry import departments
+
+CREATED = 'created'
+UPDATED = 'updated'
+COMMENTED = 'commented'
+
+QUEUE_SIZE = 100
+
+
+class Event:
+
+    def __init__(self, kind, document_id=None, actor_id=None, object_id=None):
+        self.kind = kind
+        self.document_id = document_id
+        self.actor_id = actor_id
+        self.object_id = object_id
+        self._lock = threading.Lock()
+        self._messages = None
+
+    def messages(self):
+        """Список (назва SSE-події, HTML) — назви збігаються з sse-swap елементів на сторінках"""
+        with self._lock:
+            if self._messages is None:
+                self._messages = RENDERERS[self.kind](self)
+            return self._messages
+
+
+def render_row(document):
+    return rowcache.render(document)
+
+
+def render_created(event):
+    return [('documentCreated', render_to_string('documents/partials/new_documents_notice.html'))]
+
+
+def render_updated(event):
+    from .models import Document
+    document = Document.objects.select_related('department').filter(pk=event.document_id).first()
+    if document is None:
+        return []
+    state = render_to_string('documents/partials/document_state.html', {
+        'document': document,
+        'department': departments.get(document.department_id),
+    })
+    return [(f'row-{document.pk}', render_row(document)), (f'state-{document.pk}', state)]
+
+
+def render_commented(event):
+    from .models import Comment
+    comment = Comment.objects.select_related('user', 'document__department').filter(pk=event.object_id).first()
+    if comment is None:
+        return []
+    item = render_to_string('documents/partials/comment_item.html', {'comment': comment})
+    return [(f'comment-{comment.document_id}', item), (f'row-{comment.document_id}', render_row(comment.document))]
+
+
+RENDERERS = {
+    CREATED: render_created,
+    UPDATED: render_updated,
+    COMMENTED: render_commented,
+}
+
+
+class Subscription:
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клієнт не встигає читати — закриваємо потік, EventSource перепідключиться сам
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventBus:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, loop=None):
+        subscription = Subscription(loop or asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        # Публікують синхронні view з інших потоків, тож у цикл подій слухача передаємо через call_soon_threadsafe
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Цикл подій уже закрито
+                self.unsubscribe(subscription)
+
+
+bus = EventBus()
+
+
+def publish(kind, document_id=None, actor=None, object_id=None):
+    """Публікує подію після коміту поточної транзакції (одразу, якщо транзакції немає)"""
+    event = Event(kind, document_id, actor.pk if actor is not None else None, object_id)
+    transaction.on_commit(lambda: bus.publish(event))
+
+
+def format_message(name, data):
+    lines = ''.join(f'data: {line}\n' for line in data.splitlines() or [''])
+    return f'event: {name}\n{lines}\n'
@@ -0,0 +1,165 @@
+# documents/export.py
+"""
+Потокове вивантаження заявок у CSV та XLSX.
+
+Рядки читаються через values_list().iterator(), без створення екземплярів моделі,
+і віддаються клієнту одразу — пам'ять не залежить від розміру вибірки.
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Document
+
+CHUNK_SIZE = 2000
+
+COLUMNS = [
+    ('id', "№"),
+    ('created_at', "Дата створення"),
+    ('full_name', "ПІБ"),
+    ('identifier', "Ідентифікатор"),
+    ('channel', "Канал зв'язку"),
+    ('request_type', "Тип звернення"),
+    ('department__name', "Департамент"),
+    ('status', "Статус"),
+    ('updated_at', "Дата зміни"),
+    ('comment', "Коментар"),
+]
+
+CHANNEL_LABELS = dict(Document.CHANNELS)
+TYPE_LABELS = dict(Document.TYPES)
+STATUS_LABELS = dict(Document.STATUSES)
+
+
+def format_datetime(value):
+    return timezone.localtime(value).strftime('%d.%m.%Y %H:%M') if value else ''
+
+
+def export_rows(queryset):
+    """Генерує рядки вивантаження з підписами каналу, типу та статусу"""
+    fields = [field for field, _ in COLUMNS]
+    for (pk, created_at, full_name, identifier, channel, request_type,
+         department, status, updated_at, comment) in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            pk,
+            format_datetime(created_at),
+            full_name,
+            identifier,
+            CHANNEL_LABELS.get(channel, channel),
+            TYPE_LABELS.get(request_type, request_type),
+            department or '',
+            STATUS_LABELS.get(status, status),
+            format_datetime(updated_at),
+            comment,
+        ]
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: повертає записаний рядок замість збереження"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM, щоб Excel правильно відкрив кирилицю
+    yield '\ufeff' + writer.writerow([label for _, label in COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class ZipStream:
+    """Буфер без seek для zipfile: накопичує байти, які генератор одразу віддає клієнту"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Символи, заборонені в XML 1.0
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Заявки" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    if isinstance(value, int):
+        return f'<c t="n"><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(values):
+    return '<row>' + ''.join(xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(rows):
+    """Пише мінімальну книгу XLSX (один аркуш, inline-рядки) без openpyxl, частинами по CHUNK_SIZE рядків"""
+    buffer = ZipStream()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row([label for _, label in COLUMNS])
+            ).encode())
+            for index, row in enumerate(rows, start=1):
+                sheet.write(xlsx_row(row).encode())
+                if index % CHUNK_SIZE == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
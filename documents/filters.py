@@ -0,0 +1,92 @@
+# documents/filters.py
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .clients import prefix_filter, substring_filter
+from .models import Document
+from .search import get_search_backend
+
+# Значення параметра sort -> поле дати, за яким сортується та гортається список
+SORT_KEYS = {
+    'created': 'created_at',
+    'activity': 'last_activity_at',
+}
+
+
+def sort_key(params):
+    return SORT_KEYS.get(params.get('sort'), 'created_at')
+
+
+def day_range(value):
+    """Повертає напіввідкритий інтервал [початок доби, початок наступної доби) для дати 'YYYY-MM-DD'"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        return None
+    if day is None:
+        return None
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def filter_documents(params, queryset=None):
+    """Застосовує фільтри списку вхідних (GET-параметри) до queryset заявок"""
+    if queryset is None:
+        queryset = Document.objects.select_related('department')
+    documents = queryset
+
+    # Глобальний пошук іде через повнотекстовий індекс (див. documents/search.py)
+    q = params.get('q')
+    if q:
+        documents = get_search_backend().filter(documents, q)
+
+    search_full_name = params.get('search_full_name')
+    if search_full_name:
+        documents = documents.filter(full_name__icontains=search_full_name)
+
+    # Ідентифікатор шукаємо за початком нормалізованого ключа (діапазон по індексу client_key).
+    # Якщо з такого початку немає жодного ключа — входженням, як раніше: так знаходяться й
+    # останні цифри номера чи частина коду з середини
+    search_identifier = params.get('search_identifier')
+    if search_identifier:
+        lookup = prefix_filter(search_identifier)
+        if lookup is None or not Document.objects.filter(lookup).exists():
+            lookup = substring_filter(search_identifier)
+        documents = documents.filter(lookup)
+
+    search_channel = params.get('search_channel')
+    if search_channel:
+        documents = documents.filter(channel=search_channel)
+
+    search_request_type = params.get('search_request_type')
+    if search_request_type:
+        documents = documents.filter(request_type=search_request_type)
+
+    search_department = params.get('search_department')
+    if search_department:
+        documents = documents.filter(department_id=search_department)
+
+    search_status = params.get('search_status')
+    if search_status:
+        documents = documents.filter(status=search_status)
+
+    # Діапазон замість created_at__date: функція над колонкою не дає використати індекс
+    search_created_at = params.get('search_created_at')
+    if search_created_at:
+        bounds = day_range(search_created_at)
+        if bounds:
+            documents = documents.filter(created_at__gte=bounds[0], created_at__lt=bounds[1])
+
+    search_last_activity = params.get('search_last_activity')
+    if search_last_activity:
+        bounds = day_range(search_last_activity)
+        if bounds:
+            documents = documents.filter(last_activity_at__gte=bounds[0], last_activity_at__lt=bounds[1])
+
+    key = sort_key(params)
+    return documents.order_by(f'-{key}', '-id')
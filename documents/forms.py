@@ -1,11 +1,42 @@
 # documents/forms.py
 from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.choices import CallableChoiceIterator
 from .models import Document
+from .registry import departments
+
+
+class DepartmentChoiceField(forms.ModelChoiceField):
+    """Вибір департаменту: варіанти та перевірка значення беруться з кешу довідника, без запитів до бази"""
+
+    def _department_choices(self):
+        choices = departments.choices()
+        if self.empty_label is not None:
+            choices = [('', self.empty_label)] + choices
+        return choices
+
+    def _get_choices(self):
+        # Лінивий ітератор: довідник читається під час рендерингу, а не при створенні форми
+        return CallableChoiceIterator(self._department_choices)
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        department = departments.get(getattr(value, 'pk', value))
+        if department is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return department
+
 
 class DocumentForm(forms.ModelForm):
     class Meta:
         model = Document
         fields = ['full_name', 'identifier', 'channel', 'request_type', 'department', 'status', 'comment', 'file']
+        field_classes = {'department': DepartmentChoiceField}
         
         widgets = {
             'full_name': forms.TextInput(attrs={'placeholder': 'ПІБ клієнта', 'class': 'form-input'}),
@@ -16,4 +47,4 @@ class DocumentForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-select'}),
             'comment': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Опис проблеми', 'class': 'form-input'}),
             'file': forms.FileInput(attrs={'class': 'form-file'}),
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,172 @@
+# documents/ingest.py
+"""
+Пакетне створення заявок з інтеграцій (телефонія, email, Telegram, Viber).
+
+Записи валідуються без DocumentForm, департаменти беруться з кешу довідника,
+а заявки вставляються через bulk_create окремими транзакціями по chunk_size рядків.
+"""
+import json
+
+from django.db import transaction
+
+from . import events, rollups
+from .clients import client_key
+from .models import Document
+from .registry import departments
+from .search import get_search_backend
+
+DEFAULT_CHUNK_SIZE = 1000
+
+CHANNEL_CODES = {code for code, _ in Document.CHANNELS}
+TYPE_CODES = {code for code, _ in Document.TYPES}
+STATUS_CODES = {code for code, _ in Document.STATUSES}
+
+
+class IngestResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'errors': self.errors}
+
+
+def parse_ndjson(lines):
+    """Генерує (номер рядка, запис); для некоректного JSON замість запису — повідомлення про помилку"""
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as exc:
+                yield number, f"Некоректне кодування (очікується UTF-8): {exc}"
+                continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Некоректний JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield number, "Запис має бути JSON-об'єктом"
+            continue
+        yield number, record
+
+
+class DepartmentResolver:
+    """Департаменти за id або назвою, отримані з кешу довідника один раз на всю пачку"""
+
+    def __init__(self):
+        all_departments = departments.all()
+        self.by_id = {dept.pk: dept for dept in all_departments}
+        self.by_name = {dept.name.casefold(): dept for dept in all_departments}
+
+    def resolve(self, value):
+        if value in (None, ''):
+            return None, None
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            dept = self.by_id.get(int(value))
+        else:
+            dept = self.by_name.get(str(value).strip().casefold())
+        if dept is None:
+            return None, f"Департамент не знайдено: {value}"
+        return dept, None
+
+
+def max_length(field_name):
+    return Document._meta.get_field(field_name).max_length
+
+
+def build_document(record, resolver, user=None):
+    """Перевіряє запис і повертає (Document, None) або (None, словник помилок)"""
+    errors = {}
+
+    def text(field_name, required=True):
+        value = record.get(field_name)
+        # Вкладені об'єкти та списки не приводимо до рядка мовчки
+        if isinstance(value, (dict, list)):
+            errors[field_name] = "Має бути рядком"
+            return ''
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            errors[field_name] = "Обов'язкове поле"
+        limit = max_length(field_name)
+        if limit and len(value) > limit:
+            errors[field_name] = f"Не більше {limit} символів"
+        return value
+
+    def choice(field_name, codes, default=None):
+        value = record.get(field_name) or default
+        # Нехешовані значення (списки, об'єкти) не можна шукати в множині кодів
+        if not isinstance(value, str) or value not in codes:
+            errors[field_name] = f"Невідоме значення: {value}"
+        return value
+
+    full_name = text('full_name')
+    identifier = text('identifier')
+    comment = text('comment', required=False)
+    channel = choice('channel', CHANNEL_CODES)
+    request_type = choice('request_type', TYPE_CODES)
+    status = choice('status', STATUS_CODES, default='new')
+
+    department, error = resolver.resolve(record.get('department'))
+    if error:
+        errors['department'] = error
+
+    if errors:
+        return None, errors
+
+    return Document(
+        created_by=user,
+        full_name=full_name,
+        identifier=identifier,
+        # bulk_create не викликає save(), тому ключ клієнта заповнюємо тут
+        client_key=client_key(identifier),
+        comment=comment,
+        channel=channel,
+        request_type=request_type,
+        department=department,
+        status=status,
+        is_closed=status == 'closed',
+    ), None
+
+
+def ingest_records(records, user=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Приймає ітерацію (номер рядка, запис) — наприклад, з parse_ndjson — і створює заявки.
+    Некоректні записи пропускаються й потрапляють у result.errors, решта вставляється пачками.
+    """
+    result = IngestResult()
+    resolver = DepartmentResolver()
+    batch = []
+
+    for number, record in records:
+        if isinstance(record, str):
+            result.add_error(number, {'__all__': record})
+            continue
+        document, errors = build_document(record, resolver, user)
+        if errors:
+            result.add_error(number, errors)
+            continue
+        batch.append(document)
+        if len(batch) >= chunk_size:
+            result.created += _insert(batch)
+            batch = []
+
+    if batch:
+        result.created += _insert(batch)
+    return result
+
+
+def _insert(batch):
+    with transaction.atomic():
+        created = Document.objects.bulk_create(batch)
+        # bulk_create не надсилає post_save, тому індекс пошуку оновлюємо явно
+        get_search_backend().index(created)
+        rollups.record_created(created)
+        events.publish(events.CREATED)
+    return len(created)
@@ -0,0 +1,153 @@
+# documents/jobs.py
+"""
+Черга фонових задач у базі даних, без зовнішнього брокера.
+
+enqueue() додає рядок Job у поточній транзакції, тож задача з'являється в черзі лише
+разом з даними, які вона обробляє. Воркер (команда run_jobs) забирає задачі умовним
+UPDATE queued -> running і виконує їх у пулі потоків. Невдала задача повертається в чергу
+з паузою, що зростає, і після MAX_ATTEMPTS спроб позначається як failed.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+# Задача в статусі running довше цього часу вважається покинутою (воркер впав)
+STALE_AFTER = timedelta(minutes=15)
+
+TASKS = {}
+
+
+def task(kind):
+    """Реєструє функцію як обробник задач kind; аргументи задачі — ключі payload"""
+    def register(func):
+        TASKS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, **payload):
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def claim(limit):
+    """Забирає до limit готових задач; кожну — умовним UPDATE, тож два воркери не візьмуть одну задачу"""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('pk', flat=True)[:limit]
+    )
+    claimed = [
+        pk for pk in candidates
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now, attempts=F('attempts') + 1,
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_after', 'id'))
+
+
+def execute(job):
+    handler = TASKS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"Невідомий тип задачі: {job.kind}")
+        handler(**job.payload)
+    except Exception as exc:
+        logger.exception("Задача %s завершилась з помилкою", job)
+        now = timezone.now()
+        if job.attempts >= MAX_ATTEMPTS:
+            changes = {'status': Job.FAILED, 'finished_at': now}
+        else:
+            changes = {'status': Job.QUEUED, 'run_after': now + RETRY_DELAY * 2 ** (job.attempts - 1)}
+        Job.objects.filter(pk=job.pk).update(error=f"{type(exc).__name__}: {exc}", **changes)
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now(), error='')
+    return True
+
+
+def requeue_stale():
+    return Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - STALE_AFTER).update(
+        status=Job.QUEUED, run_after=timezone.now(),
+    )
+
+
+def run_pending(limit=100):
+    """Виконує готові задачі в поточному потоці (для тестів і run_jobs --once без пулу)"""
+    jobs = claim(limit)
+    for job in jobs:
+        execute(job)
+    return len(jobs)
+
+
+class Worker:
+    """Опитує чергу й виконує задачі в пулі з threads потоків"""
+
+    def __init__(self, threads=4, poll_interval=1.0):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+
+    def _execute(self, job):
+        try:
+            return execute(job)
+        finally:
+            # У кожного потоку своє з'єднання з базою; закриваємо його за CONN_MAX_AGE
+            close_old_connections()
+
+    def run_once(self, executor):
+        jobs = claim(self.threads)
+        list(executor.map(self._execute, jobs))
+        return len(jobs)
+
+    def run(self, once=False):
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='jobs') as executor:
+            requeue_stale()
+            while not self.stopped.is_set():
+                processed = self.run_once(executor)
+                close_old_connections()
+                if once and not processed:
+                    return
+                if not processed:
+                    self.stopped.wait(self.poll_interval)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def seconds(value):
+    return round(value.total_seconds(), 3) if value is not None else None
+
+
+def stats(window=timedelta(hours=1)):
+    """Стан черги та пропускна здатність за останній window"""
+    now = timezone.now()
+    counts = dict(Job.objects.order_by().values_list('status').annotate(Count('id')))
+    finished = Job.objects.filter(status=Job.DONE, finished_at__gte=now - window).aggregate(
+        done=Count('id'),
+        wait=Avg(F('started_at') - F('created_at')),
+        duration=Avg(F('finished_at') - F('started_at')),
+    )
+    oldest = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'queued': counts.get(Job.QUEUED, 0),
+        'running': counts.get(Job.RUNNING, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'done': counts.get(Job.DONE, 0),
+        'window_seconds': int(window.total_seconds()),
+        'done_in_window': finished['done'],
+        'throughput_per_minute': round(finished['done'] / (window.total_seconds() / 60), 2),
+        'avg_wait_seconds': seconds(finished['wait']),
+        'avg_duration_seconds': seconds(finished['duration']),
+        'oldest_queued_seconds': seconds(now - oldest) if oldest else None,
+    }
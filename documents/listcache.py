@@ -0,0 +1,97 @@
+# documents/listcache.py
+"""
+Короткочасний кеш сторінок списку вхідних.
+
+Ключ — нормалізований набір фільтрів (лише відомі параметри, без порожніх, у сталому порядку),
+розмір сторінки й поточне покоління. Значення — id заявок сторінки та ознаки наступної/попередньої
+сторінки. При попаданні запит з фільтрами не виконується зовсім: рядки читаються за первинним ключем.
+
+Будь-який запис у Document збільшує покоління (DocumentQuerySet та сигнали моделі), тож старі
+записи просто перестають читатися й вичищаються за TTL. Покоління зберігається в кеші
+DOCUMENTS_INBOX_CACHE: зі спільним кешем (Redis, Memcached) інвалідацію бачать усі воркери,
+з LocMemCache — лише поточний процес, а зміни з інших процесів з'являються не пізніше
+DOCUMENTS_INBOX_CACHE_TTL секунд.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+from .pagination import KeysetPage
+
+GENERATION_KEY = 'documents:inbox:generation'
+KEY_PREFIX = 'documents:inbox:page'
+
+PARAMS = (
+    'q', 'sort', 'cursor',
+    'search_full_name', 'search_identifier', 'search_channel', 'search_request_type',
+    'search_department', 'search_status', 'search_created_at', 'search_last_activity',
+)
+
+
+def get_cache():
+    alias = getattr(settings, 'DOCUMENTS_INBOX_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def ttl():
+    return getattr(settings, 'DOCUMENTS_INBOX_CACHE_TTL', 15)
+
+
+def normalize(params):
+    """Канонічний рядок запиту: ?b=2&a=1&x= і ?a=1&b=2 дають один ключ"""
+    items = sorted((name, params.get(name, '').strip()) for name in PARAMS)
+    return urlencode([(name, value) for name, value in items if value])
+
+
+def _bump(cache):
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def generation():
+    """Поточне покоління сторінок (None, якщо кеш вимкнено) — також водяний знак для ETag списку"""
+    cache = get_cache()
+    return cache.get_or_set(GENERATION_KEY, 1, timeout=None) if cache is not None else None
+
+
+def invalidate():
+    """
+    Скидає всі сторінки одразу і ще раз після коміту: інакше паралельний запит між
+    першим скиданням і комітом закешував би дані, які бачив до завершення транзакції
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    _bump(cache)
+    transaction.on_commit(lambda: _bump(cache))
+
+
+def get_page(paginator, params, rows):
+    """
+    Сторінка paginator для фільтрів params; rows — заявки без фільтрів (з потрібними
+    select_related), з яких при попаданні в кеш рядки беруться за id
+    """
+    cache = get_cache()
+    cursor = params.get('cursor')
+    if cache is None:
+        return paginator.get_page(cursor)
+
+    digest = hashlib.sha1(normalize(params).encode()).hexdigest()
+    key = f'{KEY_PREFIX}:{generation()}:{paginator.per_page}:{digest}'
+
+    cached = cache.get(key)
+    if cached is not None:
+        ids, has_next, has_previous = cached
+        found = rows.in_bulk(ids)
+        # Рядок могли видалити в обхід ORM — тоді просто виконуємо запит з фільтрами
+        if len(found) == len(ids):
+            return KeysetPage([found[pk] for pk in ids], paginator, has_next, has_previous)
+
+    page = paginator.get_page(cursor)
+    cache.set(key, ([doc.pk for doc in page], page.has_next(), page.has_previous()), ttl())
+    return page
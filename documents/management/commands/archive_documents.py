@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from documents import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносить закриті заявки без активності в архівні таблиці пачками. "
+        "Кожна пачка — окрема транзакція, тож перервану команду можна просто запустити знову"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Скільки днів без активності (за замовчуванням DOCUMENTS_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help="Не більше стількох заявок за запуск")
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        moved = 0
+        for moved in archive.archive(older_than, batch_size=options['batch_size'], limit=options['limit']):
+            self.stdout.write(f"Перенесено: {moved}")
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архів заявок: {moved}"))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents import rowcache
+from documents.models import Department, Document
+
+
+def sample_documents(count):
+    """Незбережені заявки з усіма полями рядка — база не потрібна"""
+    now = timezone.now()
+    department = Department(pk=1, name="Підтримка")
+    return [
+        Document(
+            pk=pk, full_name=f"Клієнт {pk}", identifier=f"0501234{pk:03d}",
+            channel=Document.CHANNELS[pk % len(Document.CHANNELS)][0],
+            request_type=Document.TYPES[pk % len(Document.TYPES)][0],
+            status=Document.STATUSES[pk % len(Document.STATUSES)][0],
+            department=department, created_at=now, updated_at=now, last_activity_at=now,
+            comments_count=pk % 7, attachments_count=pk % 3,
+        )
+        for pk in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Вимірює рендер рядків списку вхідних без кешу, з порожнім і з заповненим кешем рядків"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def measure(self, documents, cache, repeat, warm=False):
+        """Найкращий час рендеру сторінки з repeat спроб, мс; cache=None — без кешу"""
+        best = None
+        for _ in range(repeat):
+            if cache is not None:
+                cache.clear()
+                if warm:
+                    rowcache.render_rows(documents, cache)
+            started = time.perf_counter()
+            rowcache.render_rows(documents, cache)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    def handle(self, *args, **options):
+        # Окремий кеш, щоб не змішувати тестові рядки з робочими
+        cache = LocMemCache('documents-row-benchmark', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+        repeat = options['repeat']
+        self.stdout.write(f"{'рядків':>8} {'без кешу':>10} {'холодний':>10} {'теплий':>10} {'прискорення':>12}")
+        for size in options['sizes']:
+            documents = sample_documents(size)
+            baseline = self.measure(documents, None, repeat)
+            cold = self.measure(documents, cache, repeat)
+            warm = self.measure(documents, cache, repeat, warm=True)
+            self.stdout.write(
+                f"{size:>8} {baseline:>8.2f}мс {cold:>8.2f}мс {warm:>8.2f}мс {baseline / warm:>11.1f}x"
+            )
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from documents.uploads import cleanup
+
+
+class Command(BaseCommand):
+    help = "Видаляє покинуті сесії завантаження частинами разом з тимчасовими файлами"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help="Вік сесії без активності (за замовчуванням DOCUMENTS_UPLOAD_SESSION_TTL)")
+
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        removed = cleanup(max_age)
+        self.stdout.write(self.style.SUCCESS(f"Видалено сесій: {removed}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Attachment, Document
+from documents.storage import BLOB_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Переносить файли заявок і вкладень, збережені за старою схемою, у сховище блобів"
+
+    def handle(self, *args, **options):
+        moved = 0
+        for model in (Attachment, Document):
+            legacy = (
+                model.objects.exclude(file='').exclude(file__isnull=True)
+                .exclude(file__startswith=BLOB_PREFIX + '/')
+                .only('pk', 'file')
+            )
+            for obj in legacy.iterator():
+                try:
+                    name = obj.file.storage.adopt(obj.file.name)
+                except FileNotFoundError:
+                    self.stderr.write(f"{model.__name__} {obj.pk}: файл {obj.file.name} не знайдено")
+                    continue
+                model.objects.filter(pk=obj.pk).update(file=name)
+                moved += 1
+        self.stdout.write(self.style.SUCCESS(f"Перенесено файлів: {moved}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.clients import client_key
+from documents.models import ArchivedDocument, Document
+
+
+class Command(BaseCommand):
+    help = "Заповнює нормалізований ключ клієнта (client_key) для наявних і архівних заявок"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        updated = 0
+        for model in (Document, ArchivedDocument):
+            rows = model.objects.order_by('pk').values_list('pk', 'identifier', 'client_key')
+            last_pk = 0
+            while True:
+                chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+                if not chunk:
+                    break
+                changed = [
+                    model(pk=pk, client_key=client_key(identifier))
+                    for pk, identifier, key in chunk if client_key(identifier) != key
+                ]
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, ['client_key'])
+                updated += len(changed)
+                last_pk = chunk[-1][0]
+        self.stdout.write(self.style.SUCCESS(f"Оновлено заявок: {updated}"))
@@ -0,0 +1,35 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.ingest import DEFAULT_CHUNK_SIZE, ingest_records, parse_ndjson
+
+
+class Command(BaseCommand):
+    help = "Створює заявки з файлу newline-delimited JSON (один запис на рядок; '-' — stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--user', help="Логін користувача, від імені якого створюються заявки")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Користувача {options['user']} не знайдено")
+
+        if options['path'] == '-':
+            result = ingest_records(parse_ndjson(sys.stdin), user=user, chunk_size=options['chunk_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as source:
+                result = ingest_records(parse_ndjson(source), user=user, chunk_size=options['chunk_size'])
+
+        for error in result.errors:
+            self.stderr.write(f"Рядок {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Створено заявок: {result.created}, з помилками: {len(result.errors)}"
+        ))
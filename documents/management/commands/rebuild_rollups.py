@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from documents.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Перераховує лічильники дашборду підтримки з заявок та історії змін"
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(self.style.SUCCESS("Лічильники дашборду перераховано"))
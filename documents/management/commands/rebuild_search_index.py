@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from documents.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Повністю перебудовує пошуковий індекс заявок"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Індекс перебудовано ({type(backend).__name__})"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.services import recount_activity
+
+
+class Command(BaseCommand):
+    help = "Перераховує лічильники коментарів, файлів та дату останньої активності заявок"
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="id заявок (за замовчуванням — усі)")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Document.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        updated = recount_activity(queryset, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Перераховано заявок: {updated}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from documents.archive import restore
+
+
+class Command(BaseCommand):
+    help = "Повертає заявки з архіву в робочі таблиці"
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='+', type=int, help="id заявок")
+
+    def handle(self, *args, **options):
+        restored = restore(options['ids'])
+        self.stdout.write(self.style.SUCCESS(f"Повернено з архіву заявок: {restored}"))
@@ -0,0 +1,39 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from documents import jobs
+from documents.models import Attachment
+from documents.processing import PROCESS_ATTACHMENT
+
+
+class Command(BaseCommand):
+    help = "Запускає воркер фонових задач (мініатюри, текст і перевірка вкладень)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help="Виконати все, що є в черзі, і завершитись")
+        parser.add_argument('--enqueue-unprocessed', action='store_true',
+                            help="Поставити в чергу вкладення, які ще не оброблялись")
+        parser.add_argument('--stats', action='store_true', help="Показати стан черги й вийти")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(jobs.stats(), indent=2))
+            return
+
+        if options['enqueue_unprocessed']:
+            queued = 0
+            for pk in Attachment.objects.filter(processed_at__isnull=True).values_list('pk', flat=True).iterator():
+                jobs.enqueue(PROCESS_ATTACHMENT, attachment_id=pk)
+                queued += 1
+            self.stdout.write(f"Поставлено в чергу вкладень: {queued}")
+
+        worker = jobs.Worker(threads=options['threads'], poll_interval=options['poll_interval'])
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+            signal.signal(signal.SIGINT, lambda *args: worker.stop())
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS("Воркер зупинено"))
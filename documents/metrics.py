@@ -0,0 +1,204 @@
+# documents/metrics.py
+"""
+Метрики запитів: кількість SQL-запитів, час у базі, час рендеру шаблонів і розмір відповіді.
+
+RequestMetricsMiddleware заводить для запиту RequestMetrics у contextvar; SQL рахує обгортка
+execute_wrapper, яку сигнал connection_created ставить на кожне з'єднання (contextvar
+переходить і в потоки sync_to_async під ASGI), рендер — шаблонний бекенд TimedDjangoTemplates
+(лише зовнішній рендер: вкладені рендери з тегів не рахуються двічі). Запити, зроблені під
+час рендеру, входять і в час бази, і в час рендеру.
+
+Результат іде в заголовок Server-Timing і в ковзні вибірки по маршрутах у пам'яті процесу
+(store.aggregates(), /documents/metrics/). DOCUMENTS_QUERY_BUDGETS обмежує кількість запитів
+маршруту: перевищення пишеться в лог, а з DOCUMENTS_QUERY_BUDGET_STRICT — це помилка,
+тож у тестах (базові класи documents/tests.py вмикають його) зайві запити валять тест,
+що відкрив сторінку.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+current = contextvars.ContextVar('documents_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def instrument(connection):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None:
+            return super().render(context, request)
+        metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.render_depth -= 1
+            if not metrics.render_depth:
+                metrics.render_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, що рахує час рендеру для RequestMetrics поточного запиту"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def window():
+    return getattr(settings, 'DOCUMENTS_METRICS_WINDOW', 500)
+
+
+def budget(view_name):
+    return (getattr(settings, 'DOCUMENTS_QUERY_BUDGETS', None) or {}).get(view_name)
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class MetricsStore:
+    """Останні window() вимірів кожного маршруту: (total, db, render — сек, запитів, байт)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._over_budget = {}
+
+    def record(self, view_name, sample, over_budget=False):
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None or samples.maxlen != window():
+                samples = self._samples[view_name] = deque(samples or (), maxlen=window())
+            samples.append(sample)
+            if over_budget:
+                self._over_budget[view_name] = self._over_budget.get(view_name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._over_budget.clear()
+
+    def aggregates(self):
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            over_budget = dict(self._over_budget)
+        result = {}
+        for name, samples in sorted(snapshot.items()):
+            total, db, render, queries, size = zip(*samples)
+            sizes = [value for value in size if value is not None]
+            result[name] = {
+                'requests': len(samples),
+                'avg_ms': round(sum(total) * 1000 / len(samples), 2),
+                'p50_ms': round(_percentile(total, 0.5) * 1000, 2),
+                'p95_ms': round(_percentile(total, 0.95) * 1000, 2),
+                'max_ms': round(max(total) * 1000, 2),
+                'avg_db_ms': round(sum(db) * 1000 / len(samples), 2),
+                'avg_render_ms': round(sum(render) * 1000 / len(samples), 2),
+                'avg_queries': round(sum(queries) / len(samples), 2),
+                'max_queries': max(queries),
+                'avg_bytes': round(sum(sizes) / len(sizes)) if sizes else None,
+                'query_budget': budget(name),
+                'over_budget': over_budget.get(name, 0),
+            }
+        return result
+
+
+store = MetricsStore()
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, total):
+        if getattr(settings, 'DOCUMENTS_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} SQL", '
+                f'render;dur={metrics.render_time * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}'
+            )
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        limit = budget(match.view_name)
+        over_budget = limit is not None and metrics.queries > limit
+        # Потокові відповіді (SSE, експорт) ще не віддали тіло — розмір невідомий
+        size = None if response.streaming else len(response.content)
+        store.record(match.view_name, (total, metrics.db_time, metrics.render_time, metrics.queries, size), over_budget)
+        if over_budget:
+            message = f"{match.view_name}: {metrics.queries} SQL-запитів при бюджеті {limit}"
+            if getattr(settings, 'DOCUMENTS_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-18 08:05
+
+import re
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_document_fts USING fts5("
+    "full_name, identifier, comment, tokenize = 'unicode61 remove_diacritics 2')",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS documents_document_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS doc_search_tsv_idx ON documents_document USING gin ("
+    "to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(identifier, '') "
+    "|| ' ' || coalesce(comment, '')))",
+    "CREATE INDEX IF NOT EXISTS doc_identifier_trgm_idx ON documents_document "
+    "USING gin (UPPER(identifier::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS doc_full_name_trgm_idx ON documents_document "
+    "USING gin (UPPER(full_name::text) gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS doc_full_name_trgm_idx",
+    "DROP INDEX IF EXISTS doc_identifier_trgm_idx",
+    "DROP INDEX IF EXISTS doc_search_tsv_idx",
+]
+
+
+def run(statements_by_vendor):
+    def apply(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+# Копія search.normalize_text на момент міграції: індекс має збігатися з тим, що пишуть сигнали
+APOSTROPHES = re.compile(r"['’ʼ`]")
+
+
+def normalize_text(value):
+    return APOSTROPHES.sub('', value or '')
+
+
+def fill_sqlite_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Document = apps.get_model('documents', 'Document')
+    rows = Document.objects.order_by('pk').values_list('pk', 'full_name', 'identifier', 'comment')
+    last_pk = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk)[:1000])
+            if not chunk:
+                break
+            cursor.executemany(
+                "INSERT OR REPLACE INTO documents_document_fts (rowid, full_name, identifier, comment) "
+                "VALUES (%s, %s, %s, %s)",
+                [(pk, *map(normalize_text, values)) for pk, *values in chunk],
+            )
+            last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+        migrations.RunPython(fill_sqlite_index, migrations.RunPython.noop),
+    ]
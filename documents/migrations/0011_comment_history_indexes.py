@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 07:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_document_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['document', '-created_at', '-id'], name='comment_doc_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documenthistory',
+            index=models.Index(fields=['document', '-created_at', '-id'], name='history_doc_created_id_idx'),
+        ),
+    ]
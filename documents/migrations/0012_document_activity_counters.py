@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 07:53
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def fill_counters(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    Comment = apps.get_model('documents', 'Comment')
+    Attachment = apps.get_model('documents', 'Attachment')
+    DocumentHistory = apps.get_model('documents', 'DocumentHistory')
+
+    def related(model, aggregate):
+        return Subquery(
+            model.objects.filter(document=OuterRef('pk')).order_by()
+            .values('document').annotate(value=aggregate).values('value')
+        )
+
+    Document.objects.update(
+        comments_count=Coalesce(related(Comment, Count('*')), 0),
+        attachments_count=Coalesce(related(Attachment, Count('*')), 0),
+        last_activity_at=Greatest(
+            F('created_at'),
+            Coalesce(related(Comment, Max('created_at')), F('created_at')),
+            Coalesce(related(Attachment, Max('uploaded_at')), F('created_at')),
+            Coalesce(related(DocumentHistory, Max('created_at')), F('created_at')),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_comment_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='attachments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Файлів'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Коментарів'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Остання активність'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='doc_activity_id_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-18 07:59
+
+import django.utils.timezone
+import documents.storage
+from django.db import migrations, models
+
+
+# Текст вкладень шукається окремою таблицею/індексом, щоб не перезаписувати індекс заявки
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_attachment_fts USING fts5("
+    "document_id UNINDEXED, text, tokenize = 'unicode61 remove_diacritics 2')",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS documents_attachment_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS attachment_text_tsv_idx ON documents_attachment "
+    "USING gin (to_tsvector('simple', text))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS attachment_text_tsv_idx",
+]
+
+
+def run(statements_by_vendor):
+    def apply(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='scan_status',
+            field=models.CharField(choices=[('pending', 'Очікує перевірки'), ('clean', 'Перевірено'), ('infected', 'Заражений'), ('skipped', 'Не перевірявся')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='thumbnail',
+            field=models.FileField(blank=True, null=True, storage=documents.storage.get_blob_storage, upload_to='thumbnails/'),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'В черзі'), ('running', 'Виконується'), ('done', 'Виконано'), ('failed', 'Помилка')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx'), models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx')],
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
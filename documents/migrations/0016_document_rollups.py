@@ -0,0 +1,92 @@
+# Generated by Django 6.0 on 2026-10-18 08:05
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+# Позначка закриття в DocumentHistory на момент міграції
+CLOSED_LABEL = "Зачинено"
+
+
+def fill_rollups(apps, schema_editor):
+    # Агрегація на історичних моделях, без імпорту documents.rollups: міграція не залежить від подальших змін модуля
+    Document = apps.get_model('documents', 'Document')
+    DocumentHistory = apps.get_model('documents', 'DocumentHistory')
+    StateRollup = apps.get_model('documents', 'DocumentStateRollup')
+    DailyRollup = apps.get_model('documents', 'DocumentDailyRollup')
+
+    StateRollup.objects.bulk_create([
+        StateRollup(department=row['department_id'] or 0, status=row['status'], channel=row['channel'],
+                    request_type=row['request_type'], count=row['n'])
+        for row in Document.objects.order_by()
+        .values('department_id', 'status', 'channel', 'request_type').annotate(n=Count('id'))
+    ], batch_size=1000)
+
+    daily = {}
+    created = (
+        Document.objects.order_by()
+        .values('department_id', 'channel', 'request_type', day=TruncDate('created_at'))
+        .annotate(n=Count('id'))
+    )
+    for row in created:
+        key = (row['day'], row['department_id'] or 0, row['channel'], row['request_type'])
+        daily.setdefault(key, Counter())['created'] += row['n']
+    closed = (
+        DocumentHistory.objects.filter(field_name="Статус", new_value=CLOSED_LABEL).order_by()
+        .values(
+            day=TruncDate('created_at'), department_id=F('document__department_id'),
+            channel=F('document__channel'), request_type=F('document__request_type'),
+        )
+        .annotate(n=Count('id'))
+    )
+    for row in closed:
+        key = (row['day'], row['department_id'] or 0, row['channel'], row['request_type'])
+        daily.setdefault(key, Counter())['closed'] += row['n']
+
+    DailyRollup.objects.bulk_create([
+        DailyRollup(day=day, department=department, channel=channel, request_type=request_type,
+                    created=counts['created'], closed=counts['closed'])
+        for (day, department, channel, request_type), counts in daily.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_attachment_processing_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('department', models.IntegerField(default=0)),
+                ('channel', models.CharField(max_length=20)),
+                ('request_type', models.CharField(max_length=20)),
+                ('created', models.IntegerField(default=0)),
+                ('closed', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'department', 'channel', 'request_type'), name='daily_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentStateRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.IntegerField(default=0)),
+                ('status', models.CharField(max_length=20)),
+                ('channel', models.CharField(max_length=20)),
+                ('request_type', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'status', 'channel', 'request_type'), name='state_rollup_key')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
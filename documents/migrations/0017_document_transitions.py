@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-18 08:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_transitions(apps, schema_editor):
+    """
+    Відновлює журнал переходів з DocumentHistory. Історію кожної заявки проходимо з кінця,
+    від поточного стану: old_value запису — це стан до нього, тож стан на початку не потрібен
+    """
+    Document = apps.get_model('documents', 'Document')
+    DocumentHistory = apps.get_model('documents', 'DocumentHistory')
+    DocumentTransition = apps.get_model('documents', 'DocumentTransition')
+    Department = apps.get_model('documents', 'Department')
+
+    status_codes = {label: code for code, label in Document._meta.get_field('status').choices}
+    department_ids = {"Не призначено": None}
+    for pk, name in Department.objects.order_by('-pk').values_list('pk', 'name'):
+        department_ids[name] = pk
+
+    rows = (
+        DocumentHistory.objects.filter(field_name__in=["Статус", "Департамент"])
+        .order_by('document_id', '-created_at', '-id')
+        .values_list('document_id', 'user_id', 'created_at', 'field_name', 'old_value',
+                     'document__status', 'document__department_id')
+    )
+    batch = []
+    document_id = state = None
+    for row_document, user_id, created_at, field_name, old_value, status, department in rows.iterator(chunk_size=2000):
+        if row_document != document_id:
+            document_id, state = row_document, {'status': status, 'department': department}
+        if field_name == "Статус":
+            if old_value not in status_codes:
+                continue
+            before = {**state, 'status': status_codes[old_value]}
+        else:
+            if old_value not in department_ids:
+                continue
+            before = {**state, 'department': department_ids[old_value]}
+        batch.append(DocumentTransition(
+            document_id=document_id, user_id=user_id, created_at=created_at,
+            from_status=before['status'], to_status=state['status'],
+            from_department=before['department'], to_department=state['department'],
+        ))
+        state = before
+        if len(batch) >= 1000:
+            DocumentTransition.objects.bulk_create(batch)
+            batch = []
+    DocumentTransition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0016_document_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('from_status', models.CharField(max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('from_department', models.IntegerField(blank=True, null=True)),
+                ('to_department', models.IntegerField(blank=True, null=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='documents.document')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['document', 'created_at', 'id'], name='transition_doc_created_idx')],
+            },
+        ),
+        migrations.RunPython(fill_transitions, migrations.RunPython.noop),
+    ]
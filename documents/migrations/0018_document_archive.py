@@ -0,0 +1,133 @@
+# Generated by Django 6.0 on 2026-10-18 08:16
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+import documents.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0017_document_transitions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDocument',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('identifier', models.CharField(max_length=12, verbose_name='Ідентифікатор')),
+                ('created_at', models.DateTimeField(verbose_name='Дата створення')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата зміни')),
+                ('full_name', models.CharField(max_length=100, verbose_name='ПІБ')),
+                ('channel', models.CharField(choices=[('phone', 'Телефон'), ('email', 'Email'), ('chat', 'Чат бот'), ('telegram', 'Telegram'), ('viber', 'Viber')], max_length=20, verbose_name="Канал зв'язку")),
+                ('request_type', models.CharField(choices=[('bug', 'Помилка ПЗ'), ('feature', 'Новий функціонал'), ('question', 'Консультація'), ('access', 'Надання доступу'), ('complaint', 'Скарга')], max_length=20, verbose_name='Тип звернення')),
+                ('status', models.CharField(choices=[('new', 'Новий'), ('in_progress', 'В роботі'), ('pending', 'Очікування'), ('resolved', 'Вирішено'), ('closed', 'Зачинено')], max_length=20, verbose_name='Статус')),
+                ('comment', models.TextField(blank=True, verbose_name='Коментар')),
+                ('file', models.FileField(blank=True, null=True, storage=documents.storage.get_blob_storage, upload_to='uploads/documents/', verbose_name='Файл')),
+                ('is_closed', models.BooleanField(default=True, verbose_name='Закрита')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Коментарів')),
+                ('attachments_count', models.PositiveIntegerField(default=0, verbose_name='Файлів')),
+                ('last_activity_at', models.DateTimeField(verbose_name='Остання активність')),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), verbose_name='Дата архівації')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.department')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Коментар')),
+                ('created_at', models.DateTimeField()),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='documents.archiveddocument')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttachment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('file', models.FileField(storage=documents.storage.get_blob_storage, upload_to='attachments/%Y/%m/%d/')),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('uploaded_at', models.DateTimeField()),
+                ('thumbnail', models.FileField(blank=True, null=True, storage=documents.storage.get_blob_storage, upload_to='thumbnails/')),
+                ('text', models.TextField(blank=True)),
+                ('scan_status', models.CharField(choices=[('pending', 'Очікує перевірки'), ('clean', 'Перевірено'), ('infected', 'Заражений'), ('skipped', 'Не перевірявся')], default='pending', max_length=20)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='documents.archiveddocument')),
+            ],
+            options={
+                'ordering': ['uploaded_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('field_name', models.CharField(max_length=50)),
+                ('old_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('new_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='documents.archiveddocument')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransition',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('from_status', models.CharField(max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('from_department', models.IntegerField(blank=True, null=True)),
+                ('to_department', models.IntegerField(blank=True, null=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='documents.archiveddocument')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['-created_at', '-id'], name='archive_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['department', '-created_at', '-id'], name='archive_dept_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['identifier'], name='archive_identifier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['document', '-created_at', '-id'], name='archive_comment_doc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedattachment',
+            index=models.Index(fields=['document', 'uploaded_at'], name='archive_attachment_doc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedhistory',
+            index=models.Index(fields=['document', '-created_at', '-id'], name='archive_history_doc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransition',
+            index=models.Index(fields=['document', 'created_at', 'id'], name='archive_transition_doc_idx'),
+        ),
+    ]
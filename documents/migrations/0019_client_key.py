@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 08:18
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize(identifier):
+    # Копія clients.client_key на момент міграції: міграція не залежить від подальших змін модуля
+    digits = NON_DIGITS.sub('', identifier or '')
+    if len(digits) == 10 and digits.startswith('0'):
+        return '380' + digits[1:]
+    if len(digits) == 11 and digits.startswith('80'):
+        return '3' + digits
+    return digits
+
+
+def fill_client_keys(apps, schema_editor):
+    for name in ('Document', 'ArchivedDocument'):
+        model = apps.get_model('documents', name)
+        rows = model.objects.order_by('pk').values_list('pk', 'identifier')
+        last_pk = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk)[:1000])
+            if not chunk:
+                break
+            changed = [model(pk=pk, client_key=normalize(identifier)) for pk, identifier in chunk if normalize(identifier)]
+            model.objects.bulk_update(changed, ['client_key'])
+            last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0018_document_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archiveddocument',
+            name='client_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16, verbose_name='Ключ клієнта'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='client_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16, verbose_name='Ключ клієнта'),
+        ),
+        migrations.RunPython(fill_client_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['client_key', '-created_at', '-id'], name='archive_client_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['client_key', '-created_at', '-id'], name='doc_client_created_id_idx'),
+        ),
+    ]
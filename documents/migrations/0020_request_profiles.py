@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 08:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0019_client_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Маршрут')),
+                ('path', models.CharField(max_length=500, verbose_name='Шлях')),
+                ('filters', models.CharField(blank=True, max_length=1000, verbose_name='Параметри')),
+                ('trigger', models.CharField(choices=[('staff', 'На запит персоналу'), ('sample', 'Вибірка')], max_length=20, verbose_name='Причина')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код відповіді')),
+                ('duration_ms', models.FloatField(verbose_name='Час, мс')),
+                ('queries', models.PositiveIntegerField(blank=True, null=True, verbose_name='SQL-запитів')),
+                ('filename', models.CharField(max_length=255, verbose_name='Файл')),
+                ('summary', models.TextField(blank=True, verbose_name='Найдовші виклики')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Користувач')),
+            ],
+            options={
+                'verbose_name': 'Профіль запиту',
+                'verbose_name_plural': 'Профілі запитів',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
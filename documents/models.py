@@ -1,7 +1,14 @@
 # documents/models.py
 import os
-from django.db import models
+import uuid
+from django.db import connections, models
+from django.db.models import sql
+from django.db.models.functions import Now
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import clients, listcache
+from .storage import get_blob_storage
 
 class Department(models.Model):
     name = models.CharField("Назва департаменту", max_length=100)
@@ -13,6 +20,60 @@ class Department(models.Model):
         return self.name
 
 
+# Дані самої заявки (не активність і не лічильники): масова зміна будь-якого з них — це зміна заявки
+CONTENT_FIELDS = {
+    'full_name', 'identifier', 'channel', 'request_type', 'status', 'department', 'department_id',
+    'is_closed', 'comment',
+}
+
+
+class DocumentQuerySet(models.QuerySet):
+    """Масові записи в заявки скидають кеш сторінок списку вхідних (див. listcache.py)"""
+
+    def _stamp(self, kwargs):
+        # auto_now не спрацьовує в update(): без цього ETag списку (etags.inbox) не побачив би
+        # зміну з іншого процесу
+        if CONTENT_FIELDS.intersection(kwargs) and 'updated_at' not in kwargs:
+            kwargs['updated_at'] = timezone.now()
+        return kwargs
+
+    def update(self, **kwargs):
+        updated = super().update(**self._stamp(kwargs))
+        listcache.invalidate()
+        return updated
+
+    def update_returning(self, fields, **kwargs):
+        """
+        update() одним запитом UPDATE ... RETURNING: повертає словники значень fields
+        (вже після зміни) для кожного зміненого рядка
+        """
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(self._stamp(kwargs))
+        statement, params = query.get_compiler(self.db).as_sql()
+        connection = connections[self.db]
+        columns = ', '.join(connection.ops.quote_name(self.model._meta.get_field(name).column) for name in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{statement} RETURNING {columns}', params)
+            rows = [dict(zip(fields, row)) for row in cursor.fetchall()]
+        listcache.invalidate()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        listcache.invalidate()
+        return created
+
+    def bulk_update(self, objs, *args, **kwargs):
+        updated = super().bulk_update(objs, *args, **kwargs)
+        listcache.invalidate()
+        return updated
+
+    def delete(self):
+        deleted = super().delete()
+        listcache.invalidate()
+        return deleted
+
+
 class Document(models.Model):
     
     CHANNELS = [
@@ -50,14 +111,41 @@ class Document(models.Model):
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, verbose_name="Департамент")
     status = models.CharField("Статус", max_length=20, choices=STATUSES, default='new')
     comment = models.TextField("Коментар", blank=True)
-    file = models.FileField("Файл", upload_to='uploads/documents/', blank=True, null=True)
+    file = models.FileField("Файл", upload_to='uploads/documents/', storage=get_blob_storage, blank=True, null=True)
     is_closed = models.BooleanField("Закрита", default=False)
 
+    # Денормалізовані лічильники для списку вхідних (див. services.py, команда recount_activity)
+    comments_count = models.PositiveIntegerField("Коментарів", default=0)
+    attachments_count = models.PositiveIntegerField("Файлів", default=0)
+    last_activity_at = models.DateTimeField("Остання активність", default=timezone.now)
+
+    # Нормалізований identifier (лише цифри, телефон у форматі 380...), див. clients.py
+    client_key = models.CharField("Ключ клієнта", max_length=16, blank=True, default='', editable=False)
+
+    objects = DocumentQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.client_key = clients.client_key(self.identifier)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Заявка № {self.id}"
 
     class Meta:
         ordering = ['-created_at']
+        # Композитні індекси під фільтри списку вхідних: колонка фільтра + (created_at, id)
+        # для сортування та пагінації по ключу
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='doc_created_id_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='doc_status_created_id_idx'),
+            models.Index(fields=['department', '-created_at', '-id'], name='doc_dept_created_id_idx'),
+            models.Index(fields=['department', 'status', '-created_at', '-id'], name='doc_dept_status_created_id_idx'),
+            models.Index(fields=['channel', '-created_at', '-id'], name='doc_channel_created_id_idx'),
+            models.Index(fields=['request_type', '-created_at', '-id'], name='doc_type_created_id_idx'),
+            models.Index(fields=['-last_activity_at', '-id'], name='doc_activity_id_idx'),
+            models.Index(fields=['-updated_at'], name='doc_updated_idx'),
+            models.Index(fields=['client_key', '-created_at', '-id'], name='doc_client_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.identifier} - {self.full_name}"
@@ -70,6 +158,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['document', '-created_at', '-id'], name='comment_doc_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Коментар від {self.user} до {self.document}"
@@ -88,15 +179,52 @@ class DocumentHistory(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['document', '-created_at', '-id'], name='history_doc_created_id_idx'),
+        ]
+
+
+class DocumentTransition(models.Model):
+    """
+    Зміна стану заявки з кодом статусу та id департаменту (а не підписами, як у DocumentHistory).
+    Кожен рядок містить стан до і після зміни; на ньому рахуються тривалості та SLA (див. sla.py)
+    """
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='transitions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    # id департаментів без зовнішнього ключа: журнал не має залежати від видалення департаменту
+    from_department = models.IntegerField(null=True, blank=True)
+    to_department = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['document', 'created_at', 'id'], name='transition_doc_created_idx'),
+        ]
 
 
 class Attachment(models.Model):
+    SCAN_STATUSES = [
+        ('pending', 'Очікує перевірки'),
+        ('clean', 'Перевірено'),
+        ('infected', 'Заражений'),
+        ('skipped', 'Не перевірявся'),
+    ]
+
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='attachments/%Y/%m/%d/')
+    file = models.FileField(upload_to='attachments/%Y/%m/%d/', storage=get_blob_storage)
     filename = models.CharField(max_length=255, blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Заповнюються фоновою обробкою (див. processing.py)
+    thumbnail = models.FileField(upload_to='thumbnails/', storage=get_blob_storage, blank=True, null=True)
+    text = models.TextField(blank=True)
+    scan_status = models.CharField(max_length=20, choices=SCAN_STATUSES, default='pending')
+    processed_at = models.DateTimeField(null=True, blank=True)
+
     def save(self, *args, **kwargs):
         # Якщо ім'я не задано, беремо його з файлу
         if not self.filename and self.file:
@@ -104,4 +232,231 @@ class Attachment(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.filename
\ No newline at end of file
+        return self.filename
+
+
+class Blob(models.Model):
+    """Файл у сховищі з адресацією за вмістом (див. storage.py) і кількість посилань на нього"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class UploadSession(models.Model):
+    """Незавершене завантаження файлу частинами (див. uploads.py)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='upload_sessions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.filename
+
+
+class Job(models.Model):
+    """Фонова задача в черзі на базі БД (див. jobs.py)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'В черзі'),
+        (RUNNING, 'Виконується'),
+        (DONE, 'Виконано'),
+        (FAILED, 'Помилка'),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+
+class DocumentStateRollup(models.Model):
+    """Поточна кількість заявок у кожній комбінації департамент/статус/канал/тип (див. rollups.py)"""
+    # id департаменту без зовнішнього ключа, 0 — не призначено
+    department = models.IntegerField(default=0)
+    status = models.CharField(max_length=20)
+    channel = models.CharField(max_length=20)
+    request_type = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'status', 'channel', 'request_type'], name='state_rollup_key'),
+        ]
+
+
+class DocumentDailyRollup(models.Model):
+    """Скільки заявок створено та закрито за день у розрізі департамент/канал/тип (див. rollups.py)"""
+    day = models.DateField()
+    department = models.IntegerField(default=0)
+    channel = models.CharField(max_length=20)
+    request_type = models.CharField(max_length=20)
+    created = models.IntegerField(default=0)
+    closed = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'department', 'channel', 'request_type'], name='daily_rollup_key'),
+        ]
+
+
+# --- Архів закритих заявок (див. archive.py) ---
+# Таблиці повторюють колонки робочих моделей і зберігають їхні id, тож перенесення
+# в обидва боки — INSERT ... SELECT без перетворень. Зовнішніх ключів на робочі таблиці немає.
+
+class ArchivedDocument(models.Model):
+    """Закрита заявка, перенесена з робочої таблиці; id збігається з id заявки"""
+    id = models.BigIntegerField(primary_key=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    identifier = models.CharField("Ідентифікатор", max_length=12)
+    created_at = models.DateTimeField("Дата створення")
+    updated_at = models.DateTimeField("Дата зміни")
+    full_name = models.CharField("ПІБ", max_length=100)
+    channel = models.CharField("Канал зв'язку", max_length=20, choices=Document.CHANNELS)
+    request_type = models.CharField("Тип звернення", max_length=20, choices=Document.TYPES)
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, related_name='+')
+    status = models.CharField("Статус", max_length=20, choices=Document.STATUSES)
+    comment = models.TextField("Коментар", blank=True)
+    file = models.FileField("Файл", upload_to='uploads/documents/', storage=get_blob_storage, blank=True, null=True)
+    is_closed = models.BooleanField("Закрита", default=True)
+    comments_count = models.PositiveIntegerField("Коментарів", default=0)
+    attachments_count = models.PositiveIntegerField("Файлів", default=0)
+    last_activity_at = models.DateTimeField("Остання активність")
+    client_key = models.CharField("Ключ клієнта", max_length=16, blank=True, default='', editable=False)
+    # Значення за замовчуванням на рівні бази: рядки вставляє INSERT ... SELECT
+    archived_at = models.DateTimeField("Дата архівації", db_default=Now())
+
+    def __str__(self):
+        return f"Заявка № {self.id} (архів)"
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archive_created_id_idx'),
+            models.Index(fields=['department', '-created_at', '-id'], name='archive_dept_created_id_idx'),
+            models.Index(fields=['identifier'], name='archive_identifier_idx'),
+            models.Index(fields=['client_key', '-created_at', '-id'], name='archive_client_created_id_idx'),
+        ]
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    document = models.ForeignKey(ArchivedDocument, on_delete=models.CASCADE, related_name='comments')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    text = models.TextField("Коментар")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['document', '-created_at', '-id'], name='archive_comment_doc_idx'),
+        ]
+
+
+class ArchivedHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    document = models.ForeignKey(ArchivedDocument, on_delete=models.CASCADE, related_name='history')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField()
+    field_name = models.CharField(max_length=50)
+    old_value = models.CharField(max_length=255, blank=True, null=True)
+    new_value = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['document', '-created_at', '-id'], name='archive_history_doc_idx'),
+        ]
+
+
+class ArchivedTransition(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    document = models.ForeignKey(ArchivedDocument, on_delete=models.CASCADE, related_name='transitions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    from_department = models.IntegerField(null=True, blank=True)
+    to_department = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['document', 'created_at', 'id'], name='archive_transition_doc_idx'),
+        ]
+
+
+class ArchivedAttachment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    document = models.ForeignKey(ArchivedDocument, on_delete=models.CASCADE, related_name='attachments')
+    file = models.FileField(upload_to='attachments/%Y/%m/%d/', storage=get_blob_storage)
+    filename = models.CharField(max_length=255, blank=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    uploaded_at = models.DateTimeField()
+    thumbnail = models.FileField(upload_to='thumbnails/', storage=get_blob_storage, blank=True, null=True)
+    text = models.TextField(blank=True)
+    scan_status = models.CharField(max_length=20, choices=Attachment.SCAN_STATUSES, default='pending')
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['uploaded_at', 'id']
+        indexes = [
+            models.Index(fields=['document', 'uploaded_at'], name='archive_attachment_doc_idx'),
+        ]
+
+    def __str__(self):
+        return self.filename
+
+
+class RequestProfile(models.Model):
+    """Профіль cProfile окремого запиту (див. profiling.py); сам файл pstats лежить у DOCUMENTS_PROFILE_DIR"""
+    STAFF = 'staff'
+    SAMPLE = 'sample'
+    TRIGGERS = [
+        (STAFF, 'На запит персоналу'),
+        (SAMPLE, 'Вибірка'),
+    ]
+
+    created_at = models.DateTimeField("Дата", default=timezone.now)
+    view_name = models.CharField("Маршрут", max_length=200, blank=True)
+    path = models.CharField("Шлях", max_length=500)
+    filters = models.CharField("Параметри", max_length=1000, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Користувач")
+    trigger = models.CharField("Причина", max_length=20, choices=TRIGGERS)
+    status_code = models.PositiveSmallIntegerField("Код відповіді")
+    duration_ms = models.FloatField("Час, мс")
+    queries = models.PositiveIntegerField("SQL-запитів", null=True, blank=True)
+    filename = models.CharField("Файл", max_length=255)
+    summary = models.TextField("Найдовші виклики", blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = "Профіль запиту"
+        verbose_name_plural = "Профілі запитів"
+
+    def __str__(self):
+        return f"{self.view_name or self.path} ({self.duration_ms:.0f} мс)"
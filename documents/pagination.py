@@ -0,0 +1,109 @@
+# documents/pagination.py
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(direction, created_at, pk):
+    """Пакує позицію (дата ключа, id) і напрямок у непрозорий токен для URL"""
+    raw = json.dumps([direction, created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Розпаковує токен; для пошкодженого або чужого токена повертає None"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, created_at, pk = json.loads(raw)
+        created_at = datetime.fromisoformat(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    return direction, created_at, pk
+
+
+class KeysetPage:
+    """Сторінка з API, сумісним з шаблонами Paginator (has_next, has_previous, has_other_pages)"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return ''
+        last = self.object_list[-1]
+        return encode_cursor('next', getattr(last, self.paginator.key), last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return ''
+        first = self.object_list[0]
+        return encode_cursor('prev', getattr(first, self.paginator.key), first.pk)
+
+
+class KeysetPaginator:
+    """
+    Пагінація по ключу (key, id) від новіших до старіших; key — поле дати (created_at за замовчуванням).
+    Кожна сторінка — це один запит LIMIT per_page + 1 по індексу, без OFFSET і без COUNT(*),
+    тому N-та сторінка коштує стільки ж, скільки перша.
+    """
+
+    def __init__(self, queryset, per_page, key='created_at'):
+        self.key = key
+        self.queryset = queryset.order_by(f'-{key}', '-id')
+        self.per_page = per_page
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        direction, value, pk = cursor
+        key = self.key
+        if direction == 'next':
+            # key <= t, окрім рядків з тим самим t та id >= pk: діапазон по індексу (key, id)
+            rows = list(
+                self.queryset
+                .filter(**{f'{key}__lte': value})
+                .exclude(**{key: value, 'id__gte': pk})[:self.per_page + 1]
+            )
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        rows = list(
+            self.queryset
+            .filter(**{f'{key}__gte': value})
+            .exclude(**{key: value, 'id__lte': pk})
+            .order_by(key, 'id')[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        if not rows:
+            # Попередніх рядків уже немає (наприклад, їх видалили) — повертаємось на першу сторінку
+            return self.get_page(None)
+        return KeysetPage(rows, self, True, has_previous)
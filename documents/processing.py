@@ -0,0 +1,130 @@
+# documents/processing.py
+"""
+Фонова обробка вкладень: перевірка на віруси, мініатюра та текст для пошуку.
+
+Задача ставиться в чергу (jobs.py) разом зі створенням вкладення, виконується воркером run_jobs.
+Мініатюри зображень потребують Pillow, PDF — pdftoppm (poppler-utils); текст PDF береться
+з pdftotext або pypdf. Якщо інструмента немає, відповідний крок пропускається.
+Перевірку на віруси виконує функція з DOCUMENTS_SCAN_HOOK (dotted path): вона отримує шлях
+до файлу й повертає True, якщо файл чистий.
+"""
+import io
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import task
+from .models import Attachment
+from .search import get_search_backend
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+PROCESS_ATTACHMENT = 'attachment.process'
+THUMBNAIL_SIZE = (320, 320)
+TEXT_LIMIT = 200_000
+TOOL_TIMEOUT = 60
+
+
+def scan(path):
+    """Повертає статус перевірки для Attachment.scan_status"""
+    hook = getattr(settings, 'DOCUMENTS_SCAN_HOOK', None)
+    if not hook:
+        return 'skipped'
+    return 'clean' if import_string(hook)(path) else 'infected'
+
+
+def image_thumbnail(source):
+    with Image.open(source) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=80)
+        return output.getvalue()
+
+
+def pdf_thumbnail(path):
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = os.path.join(tmp, 'page')
+        subprocess.run(
+            ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-jpeg',
+             '-scale-to', str(max(THUMBNAIL_SIZE)), path, prefix],
+            check=True, capture_output=True, timeout=TOOL_TIMEOUT,
+        )
+        with open(prefix + '.jpg', 'rb') as page:
+            return page.read()
+
+
+def make_thumbnail(path, content_type):
+    if content_type == 'application/pdf' and shutil.which('pdftoppm'):
+        return pdf_thumbnail(path)
+    if content_type and content_type.startswith('image/') and Image is not None:
+        return image_thumbnail(path)
+    return None
+
+
+def extract_text(path, content_type):
+    if content_type and content_type.startswith('text/'):
+        with open(path, 'rb') as source:
+            return source.read(TEXT_LIMIT * 4).decode('utf-8', errors='replace')[:TEXT_LIMIT]
+    if content_type == 'application/pdf':
+        if shutil.which('pdftotext'):
+            result = subprocess.run(
+                ['pdftotext', '-enc', 'UTF-8', path, '-'],
+                check=True, capture_output=True, timeout=TOOL_TIMEOUT,
+            )
+            return result.stdout.decode('utf-8', errors='replace')[:TEXT_LIMIT]
+        if pypdf is not None:
+            parts = []
+            length = 0
+            for page in pypdf.PdfReader(path).pages:
+                part = page.extract_text() or ''
+                parts.append(part)
+                length += len(part)
+                if length >= TEXT_LIMIT:
+                    break
+            return '\n'.join(parts)[:TEXT_LIMIT]
+    return ''
+
+
+@task(PROCESS_ATTACHMENT)
+def process_attachment(attachment_id):
+    attachment = Attachment.objects.filter(pk=attachment_id).defer('text').first()
+    if attachment is None:
+        # Вкладення видалили раніше, ніж до нього дійшла черга
+        return
+
+    path = attachment.file.path
+    content_type = mimetypes.guess_type(attachment.filename or attachment.file.name)[0]
+    changes = {'scan_status': scan(path), 'processed_at': timezone.now()}
+
+    if changes['scan_status'] != 'infected':
+        changes['text'] = extract_text(path, content_type)
+        thumbnail = make_thumbnail(path, content_type)
+        if thumbnail and not attachment.thumbnail:
+            storage = attachment.thumbnail.storage
+            changes['thumbnail'] = storage.save(f'thumbnails/{attachment.pk}.jpg', ContentFile(thumbnail))
+
+    if not Attachment.objects.filter(pk=attachment_id).update(**changes):
+        # Вкладення видалили під час обробки — мініатюра нікому не потрібна
+        if changes.get('thumbnail'):
+            attachment.thumbnail.storage.delete(changes['thumbnail'])
+        return
+
+    if changes.get('text'):
+        get_search_backend().index_attachment(attachment_id, attachment.document_id, changes['text'])
@@ -0,0 +1,126 @@
+# documents/profiling.py
+"""
+Профілювання окремих запитів у продакшені: cProfile навколо представлення.
+
+Вмикається DOCUMENTS_PROFILING. Вимкнене — ProfilingMiddleware при старті прибирає себе з ланцюжка
+(MiddlewareNotUsed) і запити не виконують жодної зайвої роботи. Увімкнене профілює:
+- запити персоналу із заголовком X-Profile: 1 або параметром ?_profile=1;
+- у середньому кожен N-й запит, якщо DOCUMENTS_PROFILE_SAMPLE_RATE = N (0 — без вибірки).
+Результат — файл pstats у DOCUMENTS_PROFILE_DIR (відкривається snakeviz, gprof2dot, flameprof)
+і запис RequestProfile з маршрутом, параметрами, часом, кількістю SQL та найдовшими викликами;
+список — в адмінці. Зберігаються лише останні DOCUMENTS_PROFILE_KEEP профілів.
+Асинхронні представлення (SSE) не профілюються.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import metrics
+from .models import RequestProfile
+
+TRIGGER_HEADER = 'X-Profile'
+TRIGGER_PARAM = '_profile'
+SUMMARY_LINES = 40
+
+
+def profile_dir():
+    path = getattr(settings, 'DOCUMENTS_PROFILE_DIR', None) or os.path.join(settings.BASE_DIR, 'profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def profile_path(profile):
+    return os.path.join(profile_dir(), profile.filename)
+
+
+def trigger(request):
+    """Причина профілювати запит (RequestProfile.STAFF / SAMPLE) або None"""
+    # Користувача читаємо лише для запитів з прапорцем, щоб решта не вантажила сесію
+    if request.headers.get(TRIGGER_HEADER) == '1' or request.GET.get(TRIGGER_PARAM) == '1':
+        if request.user.is_staff:
+            return RequestProfile.STAFF
+    rate = getattr(settings, 'DOCUMENTS_PROFILE_SAMPLE_RATE', 0)
+    if rate and random.randrange(rate) == 0:
+        return RequestProfile.SAMPLE
+    return None
+
+
+def save(request, response, profiler, kind, duration):
+    request_metrics = metrics.current.get()
+    # Запис профілю не повинен потрапити в метрики й бюджет запитів самого запиту
+    token = metrics.current.set(None)
+    try:
+        match = request.resolver_match
+        view_name = match.view_name if match else ''
+        filename = f"{timezone.now():%Y%m%d-%H%M%S}-{slugify(view_name or 'request')}-{uuid.uuid4().hex[:8]}.prof"
+        profiler.dump_stats(os.path.join(profile_dir(), filename))
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        params = request.GET.copy()
+        params.pop(TRIGGER_PARAM, None)
+        user = getattr(request, 'user', None)
+        profile = RequestProfile.objects.create(
+            view_name=view_name,
+            path=request.path[:500],
+            filters=params.urlencode()[:1000],
+            user=user if user is not None and user.is_authenticated else None,
+            trigger=kind,
+            status_code=response.status_code,
+            duration_ms=round(duration * 1000, 2),
+            queries=request_metrics.queries if request_metrics is not None else None,
+            filename=filename,
+            summary=summary.getvalue(),
+        )
+        prune()
+    finally:
+        metrics.current.reset(token)
+    return profile
+
+
+def prune():
+    """Видаляє профілі понад DOCUMENTS_PROFILE_KEEP найновіших (файли прибирає сигнал post_delete)"""
+    keep = getattr(settings, 'DOCUMENTS_PROFILE_KEEP', 200)
+    stale = RequestProfile.objects.values_list('pk', flat=True)[keep:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+
+
+def remove_file(profile):
+    try:
+        os.remove(profile_path(profile))
+    except FileNotFoundError:
+        pass
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DOCUMENTS_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func):
+            return None
+        kind = trigger(request)
+        if kind is None:
+            return None
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+        profile = save(request, response, profiler, kind, time.perf_counter() - started)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
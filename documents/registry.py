@@ -0,0 +1,106 @@
+# documents/registry.py
+"""
+Кеш довідника департаментів.
+
+Список тримається в пам'яті процесу й скидається сигналами post_save/post_delete.
+Щоб зміни бачили інші воркери, можна вказати DOCUMENTS_DEPARTMENT_CACHE (аліас з CACHES):
+тоді список і лічильник поколінь зберігаються в спільному кеші, а процес
+перечитує список, коли покоління змінилось. Без спільного кешу локальна копія
+живе не довше DOCUMENTS_DEPARTMENT_CACHE_TTL секунд.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Department
+
+LIST_KEY = 'documents:departments'
+GENERATION_KEY = 'documents:departments:generation'
+
+
+class DepartmentRegistry:
+    """
+    Завантажений список разом зі словником за id, поколінням і часом завантаження — один
+    незмінний знімок: читачі беруть його локально, тож invalidate() з іншого потоку
+    не може підмінити дані посеред all() чи get()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @property
+    def shared_cache(self):
+        alias = getattr(settings, 'DOCUMENTS_DEPARTMENT_CACHE', None)
+        return caches[alias] if alias else None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'DOCUMENTS_DEPARTMENT_CACHE_TTL', 60)
+
+    def _is_fresh(self, snapshot):
+        if snapshot is None:
+            return False
+        _, _, generation, loaded_at = snapshot
+        cache = self.shared_cache
+        if cache is not None:
+            return cache.get(GENERATION_KEY) == generation
+        return time.monotonic() - loaded_at < self.ttl
+
+    def _load(self):
+        cache = self.shared_cache
+        generation = None
+        departments = None
+        if cache is not None:
+            generation = cache.get_or_set(GENERATION_KEY, 1, timeout=None)
+            departments = cache.get(LIST_KEY)
+            if departments is not None and departments[0] != generation:
+                departments = None
+            elif departments is not None:
+                departments = departments[1]
+        if departments is None:
+            departments = tuple(Department.objects.all())
+            if cache is not None:
+                cache.set(LIST_KEY, (generation, departments), timeout=None)
+
+        snapshot = (departments, {dept.pk: dept for dept in departments}, generation, time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    def _current(self):
+        snapshot = self._snapshot
+        if not self._is_fresh(snapshot):
+            with self._lock:
+                snapshot = self._snapshot
+                if not self._is_fresh(snapshot):
+                    snapshot = self._load()
+        return snapshot
+
+    def all(self):
+        """Усі департаменти (у порядку Meta.ordering моделі)"""
+        return self._current()[0]
+
+    def get(self, pk):
+        by_id = self._current()[1]
+        try:
+            return by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def choices(self):
+        return [(dept.pk, dept.name) for dept in self.all()]
+
+    def invalidate(self):
+        self._snapshot = None
+        cache = self.shared_cache
+        if cache is not None:
+            try:
+                cache.incr(GENERATION_KEY)
+            except ValueError:
+                cache.set(GENERATION_KEY, 1, timeout=None)
+            cache.delete(LIST_KEY)
+
+
+departments = DepartmentRegistry()
@@ -0,0 +1,221 @@
+# documents/rollups.py
+"""
+Лічильники для дашборду підтримки, що оновлюються разом зі змінами заявок.
+
+DocumentStateRollup — скільки заявок зараз у кожній комбінації департамент/статус/канал/тип,
+DocumentDailyRollup — скільки створено й закрито за день. Сервіси передають сюди дельти
+в тій самій транзакції, що й зміну заявки, одним INSERT ... ON CONFLICT DO UPDATE на таблицю
+(SQLite 3.24+, PostgreSQL), тож дашборд читає лише ці невеликі таблиці
+й не рахує GROUP BY по всіх заявках. Розбіжності (зміни в обхід сервісів) виправляє
+команда rebuild_rollups.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Document, DocumentDailyRollup, DocumentHistory, DocumentStateRollup
+from .registry import departments
+
+CLOSED = 'closed'
+DIMENSIONS = ('department_id', 'status', 'channel', 'request_type')
+
+
+def state_key(values):
+    """(департамент, статус, канал, тип) з заявки або словника values()"""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name)
+    return (get('department_id') or 0, get('status'), get('channel'), get('request_type'))
+
+
+def _upsert(model, keys, deltas, rows):
+    """
+    Один INSERT ... ON CONFLICT (keys) DO UPDATE SET поле = поле + excluded.поле для всіх рядків rows
+    (кортежі значень keys + deltas): відсутні рядки створюються з дельтою, наявні — зсуваються.
+    Рядки йдуть у порядку ключів, щоб паралельні транзакції блокували їх в одному порядку.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in (*keys, *deltas)]
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+    conflict = ', '.join(quote(model._meta.get_field(name).column) for name in keys)
+    updates = ', '.join(
+        f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}'
+        for column in (model._meta.get_field(name).column for name in deltas)
+    )
+    params = [field.get_db_prep_value(value, connection) for row in sorted(rows) for field, value in zip(fields, row)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+            f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+            params,
+        )
+
+
+def apply(states=None, daily=None):
+    """
+    states: Counter{state_key: дельта}; daily: Counter{(день, департамент, канал, тип, поле): дельта}.
+    Не більше одного запиту на таблицю.
+    """
+    _upsert(
+        DocumentStateRollup, ('department', 'status', 'channel', 'request_type'), ('count',),
+        [(*key, delta) for key, delta in (states or {}).items() if delta],
+    )
+    per_day = {}
+    for (day, department, channel, request_type, field), delta in (daily or {}).items():
+        if delta:
+            counts = per_day.setdefault((day, department, channel, request_type), {'created': 0, 'closed': 0})
+            counts[field] += delta
+    _upsert(
+        DocumentDailyRollup, ('day', 'department', 'channel', 'request_type'), ('created', 'closed'),
+        [(*key, counts['created'], counts['closed']) for key, counts in per_day.items()],
+    )
+
+
+def record_created(documents):
+    states = Counter()
+    daily = Counter()
+    for document in documents:
+        department, status, channel, request_type = key = state_key(document)
+        states[key] += 1
+        daily[(timezone.localdate(document.created_at), department, channel, request_type, 'created')] += 1
+        if status == CLOSED:
+            daily[(timezone.localdate(document.created_at), department, channel, request_type, 'closed')] += 1
+    apply(states, daily)
+
+
+def record_transitions(rows, changes):
+    """rows — словники values() зі станом заявок до зміни, changes — нові значення полів"""
+    states = Counter()
+    daily = Counter()
+    today = timezone.localdate()
+    for row in rows:
+        before = state_key(row)
+        after = state_key({**row, **changes})
+        states[before] -= 1
+        states[after] += 1
+        if after[1] == CLOSED and before[1] != CLOSED:
+            department, _, channel, request_type = after
+            daily[(today, department, channel, request_type, 'closed')] += 1
+    apply(states, daily)
+
+
+def record_deleted(document):
+    # Стан беремо з бази: екземпляр міг застаріти після масових дій
+    row = Document.objects.filter(pk=document.pk).values(*DIMENSIONS).first()
+    if row is not None:
+        apply(Counter({state_key(row): -1}))
+
+
+def rebuild():
+    """
+    Перераховує обидві таблиці з заявок та історії (команда rebuild_rollups).
+    Денні рядки розкладаються за поточним департаментом/каналом/типом заявки; видалені та архівні
+    заявки (archive.py) не враховуються.
+    """
+    closed_label = dict(Document.STATUSES)[CLOSED]
+
+    with transaction.atomic():
+        DocumentStateRollup.objects.all().delete()
+        DocumentDailyRollup.objects.all().delete()
+
+        DocumentStateRollup.objects.bulk_create([
+            DocumentStateRollup(department=row['department_id'] or 0, status=row['status'], channel=row['channel'],
+                                request_type=row['request_type'], count=row['n'])
+            for row in Document.objects.order_by().values(*DIMENSIONS).annotate(n=Count('id'))
+        ], batch_size=1000)
+
+        daily = {}
+        created = (
+            Document.objects.order_by()
+            .values('department_id', 'channel', 'request_type', day=TruncDate('created_at'))
+            .annotate(n=Count('id'))
+        )
+        for row in created:
+            key = (row['day'], row['department_id'] or 0, row['channel'], row['request_type'])
+            daily.setdefault(key, Counter())['created'] += row['n']
+        closed = (
+            DocumentHistory.objects.filter(field_name="Статус", new_value=closed_label).order_by()
+            .values(
+                day=TruncDate('created_at'), department_id=F('document__department_id'),
+                channel=F('document__channel'), request_type=F('document__request_type'),
+            )
+            .annotate(n=Count('id'))
+        )
+        for row in closed:
+            key = (row['day'], row['department_id'] or 0, row['channel'], row['request_type'])
+            daily.setdefault(key, Counter())['closed'] += row['n']
+
+        DocumentDailyRollup.objects.bulk_create([
+            DocumentDailyRollup(day=day, department=department, channel=channel, request_type=request_type,
+                                created=counts['created'], closed=counts['closed'])
+            for (day, department, channel, request_type), counts in daily.items()
+        ], batch_size=1000)
+
+
+def ranked(counter, labels):
+    total = sum(counter.values()) or 1
+    return [
+        {'key': key, 'label': labels(key), 'count': count, 'percent': round(count * 100 / total)}
+        for key, count in counter.most_common() if count > 0
+    ]
+
+
+def dashboard(days=30):
+    """Дані дашборду — два запити до таблиць лічильників, незалежно від кількості заявок"""
+    by_status = Counter()
+    open_by_department = Counter()
+    open_by_channel = Counter()
+    open_by_type = Counter()
+    rows = DocumentStateRollup.objects.filter(count__gt=0).values_list(
+        'department', 'status', 'channel', 'request_type', 'count',
+    )
+    for department, status, channel, request_type, count in rows:
+        by_status[status] += count
+        if status != CLOSED:
+            open_by_department[department] += count
+            open_by_channel[channel] += count
+            open_by_type[request_type] += count
+
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    per_day = {
+        row['day']: row
+        for row in DocumentDailyRollup.objects.filter(day__gte=since).values('day')
+        .annotate(created=Sum('created'), closed=Sum('closed')).order_by('day')
+    }
+    trend = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = per_day.get(day, {})
+        trend.append({'day': day, 'created': row.get('created') or 0, 'closed': row.get('closed') or 0})
+    peak = max([max(item['created'], item['closed']) for item in trend] + [1])
+    for item in trend:
+        item['created_percent'] = round(item['created'] * 100 / peak)
+        item['closed_percent'] = round(item['closed'] * 100 / peak)
+
+    status_labels = dict(Document.STATUSES)
+    channel_labels = dict(Document.CHANNELS)
+    type_labels = dict(Document.TYPES)
+
+    def department_label(pk):
+        department = departments.get(pk) if pk else None
+        return department.name if department else "Не призначено"
+
+    return {
+        'total': sum(by_status.values()),
+        'open_total': sum(open_by_department.values()),
+        'by_status': ranked(by_status, lambda key: status_labels.get(key, key)),
+        'by_department': ranked(open_by_department, department_label),
+        'by_channel': ranked(open_by_channel, lambda key: channel_labels.get(key, key)),
+        'by_type': ranked(open_by_type, lambda key: type_labels.get(key, key)),
+        'trend': trend,
+        'created_in_period': sum(item['created'] for item in trend),
+        'closed_in_period': sum(item['closed'] for item in trend),
+        'days': days,
+    }
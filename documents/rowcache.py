@@ -0,0 +1,65 @@
+# documents/rowcache.py
+"""
+Кеш відрендерених рядків списку вхідних (partials/table_row.html).
+
+Рядок залежить лише від полів заявки, тож ключ — id заявки та її версія: updated_at,
+last_activity_at і лічильники коментарів/файлів (services._touch змінює їх, не чіпаючи
+updated_at), назва департаменту (її міняють в іншій таблиці) та часовий пояс показу дат.
+Змінена заявка дає новий ключ, а старий рядок з часом витісняється з кешу.
+Уся сторінка читається одним get_many, відсутні рядки записуються одним set_many.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+TEMPLATE = 'documents/partials/table_row.html'
+# Збільшується при зміні table_row.html, щоб спільний кеш не віддавав рядки старої розмітки
+KEY_PREFIX = 'documents:row:1'
+
+
+def get_cache():
+    alias = getattr(settings, 'DOCUMENTS_ROW_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def ttl():
+    return getattr(settings, 'DOCUMENTS_ROW_CACHE_TTL', 24 * 60 * 60)
+
+
+def key(document):
+    department = document.department.name if document.department_id else ''
+    version = '|'.join(map(str, (
+        document.updated_at, document.last_activity_at,
+        document.comments_count, document.attachments_count,
+        department, timezone.get_current_timezone_name(),
+    )))
+    return f'{KEY_PREFIX}:{document.pk}:{hashlib.sha1(version.encode()).hexdigest()}'
+
+
+def render_rows(documents, cache=None):
+    """HTML рядків для заявок documents у тому ж порядку; cache=None — без кешу"""
+    documents = list(documents)
+    template = get_template(TEMPLATE)
+    if cache is None:
+        return [template.render({'doc': document}) for document in documents]
+
+    keys = [key(document) for document in documents]
+    cached = cache.get_many(keys)
+    rows = []
+    missing = {}
+    for document, row_key in zip(documents, keys):
+        html = cached.get(row_key)
+        if html is None:
+            html = missing[row_key] = template.render({'doc': document})
+        rows.append(mark_safe(html))
+    if missing:
+        cache.set_many(missing, ttl())
+    return rows
+
+
+def render(document):
+    return render_rows([document], get_cache())[0]
@@ -0,0 +1,195 @@
+# documents/search.py
+"""
+Повнотекстовий пошук по заявках (ПІБ, ідентифікатор, опис) та тексту їхніх вкладень.
+
+Бекенд обирається налаштуванням DOCUMENTS_SEARCH_BACKEND (dotted path до класу),
+за замовчуванням — за типом бази: FTS5 для SQLite, tsvector/pg_trgm для PostgreSQL,
+для інших баз — старий пошук через icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Українські апострофи (м'ясо, обʼєкт) прибираємо, щоб слово не розбивалось на два токени
+APOSTROPHES = re.compile(r"['’ʼ`]")
+TOKEN = re.compile(r'\w+')
+
+# Поля заявки, що потрапляють в індекс
+SEARCH_FIELDS = frozenset({'full_name', 'identifier', 'comment'})
+
+_backend = None
+
+
+def normalize_text(value):
+    return APOSTROPHES.sub('', value or '')
+
+
+def tokenize(query):
+    """Розбиває пошуковий рядок на токени в нижньому регістрі"""
+    return TOKEN.findall(normalize_text(query).lower())
+
+
+class BaseSearchBackend:
+    """Інтерфейс бекенду пошуку"""
+
+    def index(self, documents):
+        """Додає або оновлює заявки в індексі"""
+
+    def remove(self, pks):
+        """Видаляє заявки з індексу"""
+
+    def rebuild(self):
+        """Перебудовує індекс повністю"""
+
+    def index_attachment(self, attachment_id, document_id, text):
+        """Додає або оновлює текст вкладення в індексі"""
+
+    def remove_attachment(self, attachment_id):
+        """Видаляє текст вкладення з індексу"""
+
+    def filter(self, queryset, query):
+        """
+        Обмежує queryset заявками, що відповідають запиту. Порядок лишається за queryset:
+        список вхідних гортається курсором за датою та id, тож ранжування за релевантністю немає
+        """
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Пошук без індексу (LIKE '%…%'), для баз без підтримки повнотекстового пошуку"""
+
+    def filter(self, queryset, query):
+        from .models import Attachment
+        return queryset.filter(
+            Q(full_name__icontains=query) |
+            Q(identifier__icontains=query) |
+            Q(comment__icontains=query) |
+            Q(id__in=Attachment.objects.filter(text__icontains=query).values('document_id'))
+        )
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    Окрема таблиця FTS5 (rowid = id заявки), оновлюється сигналами моделі.
+    Тригери в базі не використовуються: SQLite видаляє їх разом з таблицею,
+    коли міграції перебудовують documents_document.
+    """
+    table = 'documents_document_fts'
+    attachment_table = 'documents_attachment_fts'
+
+    def match_expression(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # Кожен токен — префіксний пошук, токени поєднуються через AND
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def index(self, documents):
+        rows = [
+            (doc.pk, normalize_text(doc.full_name), normalize_text(doc.identifier), normalize_text(doc.comment))
+            for doc in documents
+        ]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (rowid, full_name, identifier, comment) VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in pks])
+
+    def rebuild(self, chunk_size=2000):
+        from .models import Attachment, Document
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(f"DELETE FROM {self.attachment_table}")
+        batch = []
+        for doc in Document.objects.only('id', 'full_name', 'identifier', 'comment').iterator(chunk_size=chunk_size):
+            batch.append(doc)
+            if len(batch) >= chunk_size:
+                self.index(batch)
+                batch = []
+        self.index(batch)
+
+        attachments = Attachment.objects.exclude(text='').values_list('id', 'document_id', 'text')
+        for attachment_id, document_id, text in attachments.iterator(chunk_size=chunk_size):
+            self.index_attachment(attachment_id, document_id, text)
+
+    def index_attachment(self, attachment_id, document_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {self.attachment_table} (rowid, document_id, text) VALUES (%s, %s, %s)",
+                [attachment_id, document_id, normalize_text(text)],
+            )
+
+    def remove_attachment(self, attachment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.attachment_table} WHERE rowid = %s", [attachment_id])
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset.none()
+        return queryset.filter(
+            Q(id__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [expression])) |
+            Q(id__in=RawSQL(
+                f"SELECT document_id FROM {self.attachment_table} WHERE {self.attachment_table} MATCH %s",
+                [expression],
+            ))
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector з конфігурацією 'simple' (без стемінгу, працює для українських слів)
+    та GIN-індексом по виразу. Індекс по виразу PostgreSQL оновлює сам, тому index/remove не потрібні.
+    """
+    vector = (
+        "to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(identifier, '') "
+        "|| ' ' || coalesce(comment, ''))"
+    )
+
+    def tsquery(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def filter(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if tsquery is None:
+            return queryset.none()
+        return queryset.filter(
+            Q(id__in=RawSQL(
+                f"SELECT id FROM documents_document WHERE {self.vector} @@ to_tsquery('simple', %s)",
+                [tsquery],
+            )) |
+            Q(id__in=RawSQL(
+                "SELECT document_id FROM documents_attachment "
+                "WHERE to_tsvector('simple', text) @@ to_tsquery('simple', %s)",
+                [tsquery],
+            ))
+        )
+
+
+DEFAULT_BACKENDS = {
+    'sqlite': 'documents.search.SQLiteFTS5Backend',
+    'postgresql': 'documents.search.PostgresSearchBackend',
+}
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'DOCUMENTS_SEARCH_BACKEND', None) or DEFAULT_BACKENDS.get(
+            connection.vendor, 'documents.search.LikeSearchBackend'
+        )
+        _backend = import_string(path)()
+    return _backend
@@ -0,0 +1,261 @@
+# documents/services.py
+"""
+Переходи стану заявки (статус, департамент, закриття).
+
+Кожен перехід — один умовний UPDATE лише змінених колонок (WHERE містить очікуване старе
+значення та is_closed = false; RETURNING віддає решту стану для лічильників) і записи
+DocumentHistory (для показу) та DocumentTransition (для SLA, див. sla.py) в тій самій транзакції.
+Якщо рядок вже змінив інший оператор, UPDATE не змінить жодного рядка і функція поверне None,
+тож зміни не перезаписуються мовчки. Лічильники дашборду (rollups.py) оновлюються
+в тій самій транзакції.
+
+Тут же підтримуються денормалізовані поля заявки для списку вхідних (comments_count,
+attachments_count, last_activity_at): кожна дія оновлює їх у своїй транзакції,
+а recount_activity перераховує їх з нуля.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import events, rollups
+from .models import Attachment, Comment, Document, DocumentHistory, DocumentTransition
+from .registry import departments
+
+STATUS_LABELS = dict(Document.STATUSES)
+NO_DEPARTMENT = "Не призначено"
+
+
+def department_name(department_id):
+    department = departments.get(department_id)
+    return department.name if department else NO_DEPARTMENT
+
+
+def _transition(document_id, before, changes, user, now):
+    """Рядок журналу переходів (коди статусів та id департаментів) для sla.py"""
+    after = {**before, **changes}
+    return DocumentTransition(
+        document_id=document_id, user=user, created_at=now,
+        from_status=before['status'], to_status=after['status'],
+        from_department=before['department_id'], to_department=after['department_id'],
+    )
+
+
+def _apply(document, guard, changes, user, field_name, old_value, new_value):
+    now = timezone.now()
+    with transaction.atomic():
+        # Один умовний UPDATE: змінюється лише рядок, де поле досі має старе значення (guard).
+        # RETURNING віддає стан після зміни — екземпляр document міг застаріти в полях,
+        # яких guard не перевіряє, а лічильники й журнал мають бачити справжній стан
+        rows = (
+            Document.objects.filter(pk=document.pk, is_closed=False, **guard)
+            .update_returning(rollups.DIMENSIONS, updated_at=now, last_activity_at=now, **changes)
+        )
+        if not rows:
+            return None
+        after = rows[0]
+        before = {**after, **guard}
+        rollups.record_transitions([before], changes)
+        _transition(document.pk, before, changes, user, now).save()
+        history = DocumentHistory.objects.create(
+            document=document,
+            user=user,
+            field_name=field_name,
+            old_value=old_value,
+            new_value=new_value,
+        )
+        events.publish(events.UPDATED, document.pk, user)
+
+    for field, value in {**after, **changes}.items():
+        setattr(document, field, value)
+    document.updated_at = now
+    document.last_activity_at = now
+    return history
+
+
+def change_status(document, new_status, user):
+    """Змінює статус, якщо в базі він досі такий, як у document; повертає запис історії або None"""
+    if new_status not in STATUS_LABELS or new_status == document.status or document.is_closed:
+        return None
+    return _apply(
+        document,
+        guard={'status': document.status},
+        changes={'status': new_status},
+        user=user,
+        field_name="Статус",
+        old_value=STATUS_LABELS.get(document.status, document.status),
+        new_value=STATUS_LABELS[new_status],
+    )
+
+
+def change_department(document, new_department, user):
+    """Передає заявку в інший департамент; повертає запис історії або None"""
+    if new_department is None or new_department.pk == document.department_id or document.is_closed:
+        return None
+    return _apply(
+        document,
+        guard={'department_id': document.department_id},
+        changes={'department_id': new_department.pk},
+        user=user,
+        field_name="Департамент",
+        old_value=department_name(document.department_id),
+        new_value=new_department.name,
+    )
+
+
+def close(document, user):
+    """Закриває заявку (статус 'closed'); повертає запис історії або None, якщо її вже закрито"""
+    if document.is_closed:
+        return None
+    return _apply(
+        document,
+        guard={'status': document.status},
+        changes={'status': 'closed', 'is_closed': True},
+        user=user,
+        field_name="Статус",
+        old_value=STATUS_LABELS.get(document.status, document.status),
+        new_value=STATUS_LABELS['closed'],
+    )
+
+
+# --- Масові дії над списком заявок ---
+
+def _bulk_apply(ids, user, field_name, changes, old_value, new_value, skip=None):
+    """
+    Один UPDATE для всіх незакритих заявок з ids (крім тих, для яких skip(row) істинне)
+    та один bulk_create записів історії. Повертає кількість змінених заявок.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # FOR UPDATE там, де база його підтримує (у SQLite блокування на запис бере вже BEGIN IMMEDIATE)
+        rows = list(
+            Document.objects.select_for_update()
+            .filter(pk__in=ids, is_closed=False)
+            .values('pk', *rollups.DIMENSIONS)
+        )
+        if skip is not None:
+            rows = [row for row in rows if not skip(row)]
+        if not rows:
+            return 0
+
+        pks = [row['pk'] for row in rows]
+        Document.objects.filter(pk__in=pks).update(updated_at=now, last_activity_at=now, **changes)
+        rollups.record_transitions(rows, changes)
+        DocumentTransition.objects.bulk_create([_transition(row['pk'], row, changes, user, now) for row in rows])
+        DocumentHistory.objects.bulk_create([
+            DocumentHistory(
+                document_id=row['pk'],
+                user=user,
+                field_name=field_name,
+                old_value=old_value(row),
+                new_value=new_value,
+            )
+            for row in rows
+        ])
+        for pk in pks:
+            events.publish(events.UPDATED, pk, user)
+    return len(rows)
+
+
+def bulk_change_status(ids, new_status, user):
+    if new_status not in STATUS_LABELS:
+        return 0
+    return _bulk_apply(
+        ids, user, "Статус",
+        changes={'status': new_status},
+        old_value=lambda row: STATUS_LABELS.get(row['status'], row['status']),
+        new_value=STATUS_LABELS[new_status],
+        skip=lambda row: row['status'] == new_status,
+    )
+
+
+def bulk_change_department(ids, new_department, user):
+    if new_department is None:
+        return 0
+    return _bulk_apply(
+        ids, user, "Департамент",
+        changes={'department_id': new_department.pk},
+        old_value=lambda row: department_name(row['department_id']),
+        new_value=new_department.name,
+        skip=lambda row: row['department_id'] == new_department.pk,
+    )
+
+
+def bulk_close(ids, user):
+    return _bulk_apply(
+        ids, user, "Статус",
+        changes={'status': 'closed', 'is_closed': True},
+        old_value=lambda row: STATUS_LABELS.get(row['status'], row['status']),
+        new_value=STATUS_LABELS['closed'],
+    )
+
+
+# --- Коментарі, файли та лічильники активності ---
+
+def _touch(document_id, now, **deltas):
+    """Зсуває лічильники заявки на deltas і оновлює last_activity_at одним UPDATE"""
+    Document.objects.filter(pk=document_id).update(
+        last_activity_at=now,
+        **{field: F(field) + delta for field, delta in deltas.items()},
+    )
+
+
+def add_comment(document, user, text):
+    with transaction.atomic():
+        comment = Comment.objects.create(document=document, user=user, text=text)
+        _touch(document.pk, comment.created_at, comments_count=1)
+        events.publish(events.COMMENTED, document.pk, user, comment.pk)
+    return comment
+
+
+def add_attachment(document, file, user):
+    """Створює вкладення; мініатюра, текст і перевірка на віруси робляться у фоні (processing.py)"""
+    with transaction.atomic():
+        attachment = Attachment.objects.create(document=document, file=file, uploaded_by=user, filename=file.name)
+        _touch(document.pk, attachment.uploaded_at, attachments_count=1)
+    return attachment
+
+
+def delete_attachment(attachment):
+    with transaction.atomic():
+        # Мініатюру могла записати фонова обробка вже після того, як екземпляр прочитали
+        attachment.refresh_from_db(fields=['thumbnail'])
+        attachment.delete()
+        _touch(attachment.document_id, timezone.now(), attachments_count=-1)
+
+
+def _related(model, aggregate):
+    return Subquery(
+        model.objects.filter(document=OuterRef('pk')).order_by()
+        .values('document').annotate(value=aggregate).values('value')
+    )
+
+
+def recount_activity(queryset=None, chunk_size=1000):
+    """
+    Перераховує лічильники та last_activity_at з коментарів, файлів та історії.
+    Оновлює пачками по chunk_size заявок (кожна пачка — один UPDATE у власній транзакції).
+    """
+    if queryset is None:
+        queryset = Document.objects.all()
+    values = {
+        'comments_count': Coalesce(_related(Comment, Count('*')), 0),
+        'attachments_count': Coalesce(_related(Attachment, Count('*')), 0),
+        'last_activity_at': Greatest(
+            F('created_at'),
+            Coalesce(_related(Comment, Max('created_at')), F('created_at')),
+            Coalesce(_related(Attachment, Max('uploaded_at')), F('created_at')),
+            Coalesce(_related(DocumentHistory, Max('created_at')), F('created_at')),
+        ),
+    }
+
+    updated = 0
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        chunk = list(pks.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return updated
+        with transaction.atomic():
+            updated += Document.objects.filter(pk__in=chunk).update(**values)
+        last_pk = chunk[-1]
@@ -0,0 +1,147 @@
+# documents/signals.py
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import jobs, listcache, metrics, profiling, rollups
+from .models import ArchivedAttachment, ArchivedDocument, Attachment, Department, Document, RequestProfile
+from .processing import PROCESS_ATTACHMENT
+from .registry import departments
+from .search import SEARCH_FIELDS, get_search_backend
+
+
+# Підтримуємо пошуковий індекс в актуальному стані при створенні та редагуванні заявок
+@receiver(post_save, sender=Document)
+def index_document(sender, instance, update_fields=None, **kwargs):
+    # Зміна статусу чи департаменту (save(update_fields=...)) не зачіпає пошукових полів
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Document)
+def unindex_document(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+# Збереження та видалення окремої заявки (масові записи скидає DocumentQuerySet)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_inbox_cache(sender, **kwargs):
+    listcache.invalidate()
+
+
+# Лічильники дашборду: нова заявка (форма, адмінка) та видалення.
+# Зміни стану рахують сервіси, пакетне створення — ingest
+@receiver(post_save, sender=Document)
+def count_created_document(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record_created([instance])
+
+
+@receiver(pre_delete, sender=Document)
+def count_deleted_document(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+
+
+# Скидаємо кеш департаментів одразу (для поточного процесу) і ще раз після коміту,
+# щоб паралельний запит не закешував дані, які бачив до завершення транзакції
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_departments(sender, **kwargs):
+    departments.invalidate()
+    transaction.on_commit(departments.invalidate)
+
+
+# Знімаємо посилання на файл у сховищі блобів (і каскадно видалені вкладення теж).
+# Перенесення в архів і назад файлів не знімає: archive.py видаляє рядки без сигналів
+@receiver(post_delete, sender=Attachment)
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=ArchivedAttachment)
+@receiver(post_delete, sender=ArchivedDocument)
+def release_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.storage.delete(instance.file.name)
+    thumbnail = getattr(instance, 'thumbnail', None)
+    if thumbnail:
+        thumbnail.storage.delete(thumbnail.name)
+
+
+# Поля з файлами у сховищі блобів. Запам'ятовуємо збережені імена, щоб заміна чи
+# очищення файлу в полі (форма, адмінка) зняла посилання на старий вміст
+BLOB_FILE_FIELDS = {
+    Document: ('file',),
+    Attachment: ('file', 'thumbnail'),
+    ArchivedDocument: ('file',),
+    ArchivedAttachment: ('file', 'thumbnail'),
+}
+
+
+def _stored_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Document)
+@receiver(post_init, sender=Attachment)
+@receiver(post_init, sender=ArchivedDocument)
+@receiver(post_init, sender=ArchivedAttachment)
+def remember_files(sender, instance, **kwargs):
+    # Відкладені поля (only/defer) не читаємо — це був би окремий запит
+    instance._stored_files = {
+        field: _stored_name(instance.__dict__[field])
+        for field in BLOB_FILE_FIELDS[sender] if field in instance.__dict__
+    }
+
+
+@receiver(pre_save, sender=Document)
+@receiver(pre_save, sender=Attachment)
+@receiver(pre_save, sender=ArchivedDocument)
+@receiver(pre_save, sender=ArchivedAttachment)
+def find_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._replaced_files = []
+    if raw or instance._state.adding:
+        return
+    for field, old in instance._stored_files.items():
+        if not old or (update_fields is not None and field not in update_fields):
+            continue
+        # Новий, ще не збережений файл має ім'я завантаження, тож і той самий вміст
+        # (нове посилання в _save) відрізняється від збереженого імені
+        if _stored_name(getattr(instance, field)) != old:
+            instance._replaced_files.append((field, old))
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=Attachment)
+@receiver(post_save, sender=ArchivedDocument)
+@receiver(post_save, sender=ArchivedAttachment)
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    for field, old in getattr(instance, '_replaced_files', ()):
+        getattr(instance, field).storage.delete(old)
+    instance._replaced_files = []
+    if not raw:
+        remember_files(sender, instance)
+
+
+@receiver(post_delete, sender=RequestProfile)
+def remove_profile_file(sender, instance, **kwargs):
+    profiling.remove_file(instance)
+
+
+# Кожне нове вкладення (сервіси, адмінка, імпорт) стає в чергу на обробку. Задача пишеться
+# в ту саму транзакцію, тож з'являється в черзі лише разом із самим вкладенням
+@receiver(post_save, sender=Attachment)
+def enqueue_attachment_processing(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        jobs.enqueue(PROCESS_ATTACHMENT, attachment_id=instance.pk)
+
+
+@receiver(post_delete, sender=Attachment)
+def unindex_attachment(sender, instance, **kwargs):
+    get_search_backend().remove_attachment(instance.pk)
+
+
+# Підрахунок SQL-запитів для метрик запитів (metrics.py) на кожному новому з'єднанні
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    metrics.instrument(connection)
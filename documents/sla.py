@@ -0,0 +1,130 @@
+# documents/sla.py
+"""
+Час у статусах та SLA заявок на журналі переходів DocumentTransition.
+
+Реакція — перший перехід зі статусу 'new', вирішення — перший перехід у 'resolved' або 'closed'.
+Нормативи (години) задаються в DOCUMENTS_SLA за типом звернення з запасним 'default'.
+Усі розрахунки — пакетні: один прохід курсором по журналу або один запит з підзапитами,
+без завантаження історії кожної заявки окремо.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Document, DocumentTransition
+
+NEW = 'new'
+DONE = ('resolved', 'closed')
+
+DEFAULT_SLA = {'default': {'response': 4, 'resolution': 72}}
+
+
+def targets(request_type):
+    """(норматив реакції, норматив вирішення) для типу звернення"""
+    config = getattr(settings, 'DOCUMENTS_SLA', None) or DEFAULT_SLA
+    target = {**config.get('default', DEFAULT_SLA['default']), **config.get(request_type, {})}
+    return timedelta(hours=target['response']), timedelta(hours=target['resolution'])
+
+
+def time_in_status(documents, now=None):
+    """
+    Генерує (id заявки, {статус: timedelta}) для заявок з queryset documents.
+    Заявки та їхні переходи читаються двома курсорами в порядку id і зливаються за один прохід.
+    """
+    now = now or timezone.now()
+    docs = documents.order_by('pk').values_list('pk', 'created_at', 'status').iterator(chunk_size=2000)
+    transitions = (
+        DocumentTransition.objects.filter(document__in=documents.order_by().values('pk'))
+        .order_by('document_id', 'created_at', 'id')
+        .values_list('document_id', 'created_at', 'from_status', 'to_status')
+        .iterator(chunk_size=2000)
+    )
+    pending = next(transitions, None)
+    for pk, created_at, status in docs:
+        durations = defaultdict(timedelta)
+        since, current = created_at, None
+        while pending is not None and pending[0] <= pk:
+            document_id, changed_at, from_status, to_status = pending
+            if document_id == pk:
+                # До першого переходу заявка була у from_status першого переходу
+                durations[current or from_status] += changed_at - since
+                since, current = changed_at, to_status
+            pending = next(transitions, None)
+        durations[current or status] += now - since
+        yield pk, durations
+
+
+def annotate(documents):
+    """Додає до заявок час першої реакції (responded_at) та вирішення (resolved_at) — один запит"""
+    transitions = DocumentTransition.objects.filter(document=OuterRef('pk')).order_by().values('document')
+    return documents.annotate(
+        responded_at=Subquery(
+            transitions.filter(from_status=NEW).annotate(at=Min('created_at')).values('at')
+        ),
+        resolved_at=Subquery(
+            transitions.filter(to_status__in=DONE).annotate(at=Min('created_at')).values('at')
+        ),
+    )
+
+
+def report(documents, now=None):
+    """
+    Генерує словники з тривалостями реакції та вирішення і ознаками порушення SLA.
+    Для незавершених етапів тривалість рахується до now.
+    """
+    now = now or timezone.now()
+    rows = annotate(documents).order_by('pk').values(
+        'pk', 'request_type', 'created_at', 'responded_at', 'resolved_at',
+    )
+    for row in rows.iterator(chunk_size=2000):
+        response_target, resolution_target = targets(row['request_type'])
+        response_time = (row['responded_at'] or now) - row['created_at']
+        resolution_time = (row['resolved_at'] or now) - row['created_at']
+        yield {
+            **row,
+            'response_time': response_time,
+            'resolution_time': resolution_time,
+            'response_breached': response_time > response_target,
+            'resolution_breached': resolution_time > resolution_target,
+        }
+
+
+def at_risk(within=timedelta(hours=1), now=None):
+    """
+    Незакриті заявки, чий строк реакції або вирішення спливає протягом within (або вже минув).
+    Умови будуються на created_at для кожного типу звернення, тож це один запит по індексах заявок.
+    """
+    now = now or timezone.now()
+    responded = DocumentTransition.objects.filter(document=OuterRef('pk'), from_status=NEW)
+    condition = Q()
+    for request_type, _ in Document.TYPES:
+        response_target, resolution_target = targets(request_type)
+        condition |= Q(request_type=request_type) & (
+            Q(status=NEW, responded=False, created_at__lte=now + within - response_target)
+            | Q(created_at__lte=now + within - resolution_target)
+        )
+    return (
+        Document.objects.annotate(responded=Exists(responded))
+        .filter(condition, is_closed=False)
+        .exclude(status__in=DONE)
+        .select_related('department')
+        .order_by('created_at', 'id')
+    )
+
+
+def deadlines(documents, within=timedelta(hours=1), now=None):
+    """Найближчий строк SLA для кожної заявки з at_risk(): словники для шаблону"""
+    now = now or timezone.now()
+    result = []
+    for document in documents:
+        response_target, resolution_target = targets(document.request_type)
+        response_due = document.created_at + response_target
+        if document.status == NEW and not document.responded and response_due <= now + within:
+            kind, due = "Реакція", response_due
+        else:
+            kind, due = "Вирішення", document.created_at + resolution_target
+        result.append({'document': document, 'kind': kind, 'due': due, 'breached': due <= now})
+    return result
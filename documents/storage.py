@@ -0,0 +1,114 @@
+# documents/storage.py
+"""
+Сховище файлів заявок з адресацією за вмістом.
+
+Під час збереження файл читається частинами й паралельно хешується (SHA-256), а вміст
+кладеться в blobs/<aa>/<bb>/<digest><розширення>. Однаковий файл лежить на диску один раз,
+кількість посилань на нього веде модель Blob. delete() лише знімає одне посилання —
+файл зникає разом з останнім. Заміна файлу в полі моделі знімає посилання на старий
+(сигнал release_replaced_files).
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_PREFIX = 'blobs'
+
+
+def blob_name(digest, extension=''):
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_blob_name(name):
+    return name.startswith(BLOB_PREFIX + '/')
+
+
+class BlobStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Остаточне ім'я визначає вміст (_save), суфікси для унікальності не потрібні
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        extension = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(os.path.join(BLOB_PREFIX, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            # Спершу посилання, потім файл: інакше паралельне видалення останнього посилання
+            # (_remove_unreferenced) може прибрати щойно опублікований файл
+            with transaction.atomic():
+                blob, created = Blob.objects.get_or_create(name=name, defaults={'size': size})
+                if not created:
+                    Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                path = self.path(name)
+                if os.path.exists(path):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(tmp_path, self.file_permissions_mode)
+                    os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        """Знімає одне посилання на файл; сам файл видаляється після коміту, коли посилань не лишилось"""
+        from .models import Blob
+
+        if not name:
+            return
+        if not is_blob_name(name):
+            # Файли, збережені до переходу на це сховище
+            super().delete(name)
+            return
+
+        with transaction.atomic():
+            Blob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            deleted, _ = Blob.objects.filter(name=name, ref_count=0).delete()
+        if deleted:
+            transaction.on_commit(lambda: self._remove_unreferenced(name))
+
+    def _remove_unreferenced(self, name):
+        from .models import Blob
+
+        # Поки чекали на коміт, той самий вміст могли завантажити знову. Перевірка й видалення
+        # в одній транзакції: вона чекає на транзакцію, що саме додає посилання (_save)
+        with transaction.atomic():
+            if not Blob.objects.select_for_update().filter(name=name).exists():
+                super().delete(name)
+
+    def adopt(self, name):
+        """Переносить файл, збережений за старою схемою, у сховище блобів; повертає нове ім'я"""
+        if is_blob_name(name):
+            return name
+        with self.open(name) as source:
+            new_name = self.save(name, source)
+        super().delete(name)
+        return new_name
+
+
+blob_storage = BlobStorage()
+
+
+def get_blob_storage():
+    return blob_storage
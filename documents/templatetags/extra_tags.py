@@ -1,11 +1,27 @@
 from django import template
 from urllib.parse import urlencode
 
+from documents import rowcache
+
 register = template.Library()
 
 @register.simple_tag
 def url_replace(request, field, value):
     """Замінює або додає параметр в URL (для пагінації з фільтрами)"""
     dict_ = request.GET.copy()
-    dict_[field] = value
-    return urlencode(dict_)
\ No newline at end of file
+    # Старий номер сторінки не сумісний з курсором
+    dict_.pop('page', None)
+    # Курсор прив'язаний до сортування та фільтрів, тому при їх зміні скидається
+    if field != 'cursor':
+        dict_.pop('cursor', None)
+    if value in (None, ''):
+        dict_.pop(field, None)
+    else:
+        dict_[field] = value
+    return urlencode(dict_)
+
+
+@register.simple_tag
+def inbox_rows(documents):
+    """Відрендерені рядки списку вхідних; незмінені заявки беруться з кешу (rowcache.py)"""
+    return rowcache.render_rows(documents, rowcache.get_cache())
@@ -0,0 +1,136 @@
+# documents/uploads.py
+"""
+Завантаження великих файлів частинами з можливістю продовження.
+
+Протокол: init (назва й розмір файлу) -> PUT частин з offset -> complete.
+Кожна частина читається з тіла запиту потоком і пишеться у тимчасовий файл сесії
+за своїм зсувом, тому повтор уже надісланої частини безпечний. Сервер пам'ятає, скільки
+байтів отримано (UploadSession.received), і клієнт після обриву продовжує з цього місця.
+Покинуті сесії прибирає команда cleanup_uploads.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UploadSession
+from . import services
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_size():
+    return getattr(settings, 'DOCUMENTS_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'DOCUMENTS_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def upload_dir():
+    path = getattr(settings, 'DOCUMENTS_UPLOAD_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f'{session.pk}.part')
+
+
+def start(document, user, filename, size):
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError("Не вказано назву файлу")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("Некоректний розмір файлу")
+    if size <= 0:
+        raise UploadError("Файл порожній")
+    if size > max_size():
+        raise UploadError("Файл завеликий", status=413)
+
+    session = UploadSession.objects.create(document=document, user=user, filename=filename[:255], size=size)
+    # Порожній файл одразу потрібного розміру: частини пишуться за своїми зсувами
+    with open(part_path(session), 'wb') as part:
+        part.truncate(size)
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """Пише length байтів з stream у файл сесії з позиції offset; повертає нову кількість отриманих байтів"""
+    if offset < 0 or offset > session.received:
+        raise UploadError("Частину надіслано не по порядку", status=409)
+    if length <= 0 or length > max_chunk_size():
+        raise UploadError("Некоректний розмір частини", status=413)
+    if offset + length > session.size:
+        raise UploadError("Частина виходить за межі файлу", status=416)
+
+    written = 0
+    with open(part_path(session), 'r+b') as part:
+        part.seek(offset)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+    if written != length:
+        raise UploadError("Частину отримано не повністю")
+
+    # Лише збільшуємо лічильник: повтор старої частини не відкотить прогрес
+    UploadSession.objects.filter(pk=session.pk, received__gte=offset).update(
+        received=Greatest(F('received'), Value(offset + length)),
+        updated_at=timezone.now(),
+    )
+    session.refresh_from_db(fields=['received'])
+    return session.received
+
+
+def complete(session):
+    """Створює вкладення з отриманого файлу (через звичайне сховище блобів) і закриває сесію"""
+    if session.received != session.size:
+        raise UploadError("Файл отримано не повністю", status=409)
+    path = part_path(session)
+    with open(path, 'rb') as part:
+        attachment = services.add_attachment(session.document, File(part, name=session.filename), session.user)
+    discard(session)
+    return attachment
+
+
+def discard(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def cleanup(max_age=None):
+    """Видаляє сесії, в які нічого не надходило довше max_age (за замовчуванням DOCUMENTS_UPLOAD_SESSION_TTL)"""
+    if max_age is None:
+        max_age = timedelta(seconds=getattr(settings, 'DOCUMENTS_UPLOAD_SESSION_TTL', 24 * 60 * 60))
+    cutoff = timezone.now() - max_age
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(session)
+        removed += 1
+
+    # Файли сесій, видалених разом із заявкою
+    directory = upload_dir()
+    active = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+    for entry in os.scandir(directory):
+        name, extension = os.path.splitext(entry.name)
+        if extension == '.part' and name not in active and entry.stat().st_mtime < cutoff.timestamp():
+            os.remove(entry.path)
+    return removed
@@ -5,16 +5,38 @@ app_name = 'documents'
 
 urlpatterns = [
     path('incoming/', views.incoming_list, name='incoming_list'),
+    path('incoming/export/', views.export_documents, name='export_documents'),
+    path('incoming/events/', views.document_events, name='document_events'),
+    path('incoming/bulk/', views.bulk_action, name='bulk_action'),
     path('create/', views.create_document, name='create_document'),
+    path('ingest/', views.ingest_documents, name='ingest_documents'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/sla/', views.sla_at_risk, name='sla_at_risk'),
+    path('jobs/stats/', views.job_stats, name='job_stats'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     path('incoming/<int:pk>/', views.document_detail, name='document_detail'),
 
     path('incoming/<int:pk>/add_comment/', views.add_comment, name='add_comment'),
+    path('incoming/<int:pk>/comments/', views.document_comments, name='document_comments'),
+    path('incoming/<int:pk>/history/', views.document_history, name='document_history'),
     path('incoming/<int:pk>/update_status/', views.update_status, name='update_status'),
     path('incoming/<int:pk>/update_department/', views.update_department, name='update_department'),
     path('incoming/<int:pk>/close/', views.close_document, name='close_document'),
 
     path('document/<int:pk>/files/', views.document_files, name='document_files'),
     path('document/<int:pk>/files/upload/', views.upload_file, name='upload_file'),
+    path('document/<int:pk>/files/upload/start/', views.upload_start, name='upload_start'),
+    path('document/files/upload/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
+    path('document/files/upload/<uuid:upload_id>/complete/', views.upload_complete, name='upload_complete'),
+    path('document/file/<int:pk>/download/', views.download_file, name='download_file'),
+    path('document/file/<int:pk>/thumbnail/', views.attachment_thumbnail, name='attachment_thumbnail'),
     path('document/file/<int:pk>/delete/', views.delete_file, name='delete_file'),
+    path('document/<int:pk>/file/', views.download_document_file, name='download_document_file'),
+
+    path('archive/', views.archive_list, name='archive_list'),
+    path('archive/<int:pk>/', views.archive_detail, name='archive_detail'),
+    path('archive/<int:pk>/restore/', views.archive_restore, name='archive_restore'),
+    path('archive/<int:pk>/file/', views.archive_document_file, name='archive_document_file'),
+    path('archive/file/<int:pk>/', views.archive_file, name='archive_file'),
     
 ]
\ No newline at end of file
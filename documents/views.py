@@ -1,69 +1,73 @@
 from django.shortcuts import render, get_object_or_404, redirect
+import asyncio
 import json
-from django.http import HttpResponse
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Document, Department, Comment, DocumentHistory
-from .models import Attachment
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST, require_safe
+from django.views.decorators.vary import vary_on_headers
+from django.utils.crypto import constant_time_compare
+from .models import Document, Comment, DocumentHistory
+from .models import Attachment, UploadSession
+from .models import ArchivedAttachment, ArchivedDocument
 from .forms import DocumentForm
+from .clients import prefix_filter, previous_documents
+from .filters import filter_documents, sort_key
+from .pagination import KeysetPaginator
+from .export import export_rows, stream_csv, stream_xlsx
+from .downloads import serve_file
+from . import archive, etags, events, jobs, listcache, metrics, rollups, sla, uploads
+from .ingest import ingest_records, parse_ndjson
+from .registry import departments
+from . import services
 
+INBOX_PAGE_SIZE = 10
+COMMENTS_PAGE_SIZE = 20
+HISTORY_PAGE_SIZE = 20
+ARCHIVE_PAGE_SIZE = 20
+SSE_HEARTBEAT = 15
+SLA_WARNING = timedelta(hours=1)
+SLA_AT_RISK_LIMIT = 20
 
-def trigger_toast(response, message, level='success'):
-    """Додає заголовок для HTMX, щоб показати повідомлення"""
+
+def trigger_toast(response, message, level='success', events=None):
+    """Додає заголовок для HTMX, щоб показати повідомлення (і, за потреби, інші події)"""
     trigger_data = {'showMessage': {'message': message, 'level': level}}
+    if events:
+        trigger_data.update(events)
     response['HX-Trigger'] = json.dumps(trigger_data)
     return response
 
 
-@login_required
-def incoming_list(request):
-    documents = Document.objects.select_related('department').all()
-
-    # --- Блок фільтрації (без змін) ---
-    q = request.GET.get('q')
-    if q:
-        documents = documents.filter(
-            Q(full_name__icontains=q) |
-            Q(identifier__icontains=q) |
-            Q(comment__icontains=q)
-        )
-
-    search_full_name = request.GET.get('search_full_name')
-    if search_full_name:
-        documents = documents.filter(full_name__icontains=search_full_name)
-
-    search_identifier = request.GET.get('search_identifier')
-    if search_identifier:
-        documents = documents.filter(identifier__icontains=search_identifier)
-
-    search_channel = request.GET.get('search_channel')
-    if search_channel:
-        documents = documents.filter(channel=search_channel)
-
-    search_request_type = request.GET.get('search_request_type')
-    if search_request_type:
-        documents = documents.filter(request_type=search_request_type)
+def revalidate(etag_func):
+    """
+    Умовний GET: ETag рахується до представлення, незмінена сторінка — 304 без рендеру.
+    Браузер зберігає відповідь, але перед кожним використанням перевіряє її (no-cache).
+    """
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+        view = cache_control(private=True, no_cache=True)(view)
+        return vary_on_headers('HX-Request')(view)
+    return decorator
 
-    search_department = request.GET.get('search_department')
-    if search_department:
-        documents = documents.filter(department_id=search_department)
 
-    search_status = request.GET.get('search_status')
-    if search_status:
-        documents = documents.filter(status=search_status)
-
-    search_created_at = request.GET.get('search_created_at')
-    if search_created_at:
-        documents = documents.filter(created_at__date=search_created_at)
-    # ----------------------------------
-
-    documents = documents.order_by('-created_at')
+@login_required
+@revalidate(etags.inbox)
+def incoming_list(request):
+    documents = filter_documents(request.GET)
 
-    paginator = Paginator(documents, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(documents, INBOX_PAGE_SIZE, key=sort_key(request.GET))
+    # Часті комбінації фільтрів беруться з кешу: тоді виконується лише вибірка рядків за id
+    page_obj = listcache.get_page(paginator, request.GET, Document.objects.select_related('department'))
 
     context = {
         'page_obj': page_obj,
@@ -71,7 +75,7 @@ def incoming_list(request):
         'channel_choices': Document.CHANNELS,
         'type_choices': Document.TYPES,
         'status_choices': Document.STATUSES,
-        'departments': Department.objects.all(),
+        'departments': departments.all(),
     }
 
     if request.headers.get('HX-Request'):
@@ -81,6 +85,102 @@ def incoming_list(request):
 
     return render(request, template, context)
 
+@login_required
+def dashboard(request):
+    """Дашборд підтримки — читає лише таблиці лічильників (rollups.py), а не заявки"""
+    context = {'stats': rollups.dashboard()}
+    if request.headers.get('HX-Request'):
+        template = "documents/dashboard_content.html"
+    else:
+        template = "documents/dashboard.html"
+    return render(request, template, context)
+
+
+@login_required
+@require_safe
+def sla_at_risk(request):
+    """Заявки, чий строк SLA спливає найближчим часом (панель дашборду)"""
+    documents = list(sla.at_risk(within=SLA_WARNING)[:SLA_AT_RISK_LIMIT])
+    return render(request, "documents/partials/sla_at_risk.html", {
+        'items': sla.deadlines(documents, within=SLA_WARNING),
+    })
+
+
+@login_required
+async def document_events(request):
+    """
+    Потік Server-Sent Events зі змінами заявок (див. events.py). Працює лише під ASGI:
+    під WSGI довге з'єднання тримало б воркер, тому віддаємо 204 — EventSource тоді не перепідключається.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    document_id = request.GET.get('document')
+    document_id = int(document_id) if document_id and document_id.isdigit() else None
+    subscription = events.bus.subscribe()
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT)
+                except TimeoutError:
+                    # Коментар-пінг, щоб проксі не закрив тихе з'єднання
+                    yield ': ping\n\n'
+                    continue
+                if document_id is not None and event.document_id not in (None, document_id):
+                    continue
+                for name, data in await sync_to_async(event.messages)():
+                    # Свій коментар автор уже бачить з відповіді на add_comment
+                    if name.startswith('comment-') and event.actor_id == user.pk:
+                        continue
+                    yield events.format_message(name, data)
+        finally:
+            events.bus.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def export_documents(request):
+    """Вивантажує всі заявки за поточними фільтрами списку (CSV або XLSX) потоком"""
+    rows = export_rows(filter_documents(request.GET))
+    filename = f"documents_{timezone.localtime():%Y%m%d_%H%M}"
+
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename += '.xlsx'
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+        filename += '.csv'
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@csrf_exempt
+@require_POST
+def ingest_documents(request):
+    """
+    Пакетне створення заявок для інтеграцій каналів.
+    Тіло — newline-delimited JSON (один запис на рядок), авторизація — заголовок
+    "Authorization: Bearer <DOCUMENTS_INGEST_TOKEN>".
+    """
+    token = getattr(settings, 'DOCUMENTS_INGEST_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    if not token or not constant_time_compare(auth, f"Bearer {token}"):
+        return JsonResponse({'error': "Недійсний токен"}, status=403)
+
+    # Читаємо тіло потоком по рядках, не завантажуючи його в пам'ять повністю
+    result = ingest_records(parse_ndjson(request))
+    return JsonResponse(result.as_dict())
+
 @login_required
 def create_document(request):
     if request.method == 'POST':
@@ -89,6 +189,7 @@ def create_document(request):
             doc = form.save(commit=False)
             doc.created_by = request.user
             doc.save()
+            events.publish(events.CREATED, doc.pk, request.user)
             # ВИПРАВЛЕНО: Використовуємо redirect замість виклику функції
             return redirect('documents:incoming_list') 
     else:
@@ -97,102 +198,116 @@ def create_document(request):
     return render(request, 'documents/partials/create_modal.html', {'form': form})
 
 @login_required
+@revalidate(etags.document)
 def document_detail(request, pk):
     document = get_object_or_404(Document, pk=pk)
-    
-    # Завантажуємо коментарі
-    comments = document.comments.select_related('user').order_by('-created_at')
-    
-    # Завантажуємо історію
-    history = document.history.select_related('user').order_by('-created_at')
+    return render_document_detail(request, document)
+
+def render_document_detail(request, document):
+    # Завантажуємо лише найновіші коментарі та історію, старіші підвантажуються при прокрутці
+    comments = KeysetPaginator(document.comments.select_related('user'), COMMENTS_PAGE_SIZE).get_page(None)
+    history = KeysetPaginator(document.history.select_related('user'), HISTORY_PAGE_SIZE).get_page(None)
 
     context = {
         'document': document,
+        'document_id': document.pk,
         'comments': comments,
         'history': history,
+        'department': departments.get(document.department_id),
         'status_choices': Document.STATUSES,
-        'departments': Department.objects.all(),
+        'departments': departments.all(),
+        'previous_documents': previous_documents(document),
     }
     return render(request, "documents/document_detail_content.html", context)
 
+def render_document_update(request, document, item=None):
+    """Змінені фрагменти сторінки заявки (стан, меню тулбару, новий запис історії) як HTMX out-of-band"""
+    context = {
+        'document': document,
+        'department': departments.get(document.department_id),
+        'status_choices': Document.STATUSES,
+        'departments': departments.all(),
+        'item': item,
+    }
+    return render(request, "documents/partials/document_update.html", context)
+
 @login_required
 @require_POST
 def update_status(request, pk):
     document = get_object_or_404(Document, pk=pk)
     new_status_code = request.POST.get('status')
     
-    # За замовчуванням повідомлення про помилку або відсутність змін
-    msg = "Статус не змінено"
-    level = "error"
-
-    if new_status_code and new_status_code != document.status and not document.is_closed:
-        old_status_display = document.get_status_display()
-        
-        document.status = new_status_code
-        document.save()
-        
-        new_status_display = document.get_status_display()
-        
-        DocumentHistory.objects.create(
-            document=document,
-            user=request.user,
-            field_name="Статус",
-            old_value=old_status_display,
-            new_value=new_status_display
-        )
-        
-        msg = f"Статус змінено на: {new_status_display}"
+    item = services.change_status(document, new_status_code, request.user)
+    if item:
+        msg = f"Статус змінено на: {item.new_value}"
         level = "success"
+    else:
+        msg, level = change_failed(document, "Статус не змінено")
 
-    # Замість redirect викликаємо відображення сторінки
-    response = document_detail(request, pk)
+    # Повертаємо лише змінені фрагменти, без повторного рендерингу всієї заявки
+    response = render_document_update(request, document, item)
     return trigger_toast(response, msg, level)
 
 @login_required
 @require_POST
 def update_department(request, pk):
     document = get_object_or_404(Document, pk=pk)
-    dept_id = request.POST.get('department')
+    new_department = departments.get(request.POST.get('department'))
     
-    msg = "Департамент не змінено"
-    level = "error"
-
-    if dept_id and not document.is_closed:
-        if str(document.department_id) != str(dept_id):
-            
-            old_dept_name = document.department.name if document.department else "Не призначено"
-            
-            document.department_id = dept_id
-            document.save()
-            
-            document.refresh_from_db()
-            new_dept_name = document.department.name
-            
-            DocumentHistory.objects.create(
-                document=document,
-                user=request.user,
-                field_name="Департамент",
-                old_value=old_dept_name,
-                new_value=new_dept_name
-            )
-            
-            msg = f"Передано в департамент: {new_dept_name}"
-            level = "success"
+    item = services.change_department(document, new_department, request.user)
+    if item:
+        msg = f"Передано в департамент: {item.new_value}"
+        level = "success"
+    else:
+        msg, level = change_failed(document, "Департамент не змінено")
 
-    # Викликаємо відображення та чіпляємо тост
-    response = document_detail(request, pk)
+    response = render_document_update(request, document, item)
     return trigger_toast(response, msg, level)
 
+def change_failed(document, msg):
+    """Якщо перехід не вдався через паралельну зміну, підтягуємо актуальний стан і повідомляємо про це"""
+    updated_at = document.updated_at
+    document.refresh_from_db(fields=['status', 'department', 'is_closed', 'updated_at'])
+    if document.updated_at != updated_at:
+        return "Заявку щойно змінив інший користувач — показано актуальний стан", "error"
+    return msg, "error"
+
 @login_required
 def close_document(request, pk):
     document = get_object_or_404(Document, pk=pk)
     if request.method == 'POST':
-        # Можна додати запис в історію про закриття тут, якщо потрібно
-        document.is_closed = True
-        document.status = 'closed' # Перевірте, чи такий код є у ваших STATUSES
-        document.save()
+        services.close(document, request.user)
     return redirect('documents:document_detail', pk=pk)
 
+@login_required
+@require_POST
+def bulk_action(request):
+    """Масова зміна статусу, департаменту або закриття вибраних у списку заявок"""
+    ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+    action = request.POST.get('action')
+    limit = getattr(settings, 'DOCUMENTS_BULK_ACTION_LIMIT', 500)
+
+    response = HttpResponse(status=204)
+    if not ids:
+        return trigger_toast(response, "Не вибрано жодної заявки", "error")
+    if len(ids) > limit:
+        return trigger_toast(response, f"Можна змінити не більше {limit} заявок за раз", "error")
+
+    if action == 'status':
+        changed = services.bulk_change_status(ids, request.POST.get('status'), request.user)
+    elif action == 'department':
+        changed = services.bulk_change_department(ids, departments.get(request.POST.get('department')), request.user)
+    elif action == 'close':
+        changed = services.bulk_close(ids, request.user)
+    else:
+        return trigger_toast(response, "Оберіть дію", "error")
+
+    if not changed:
+        return trigger_toast(response, "Жодну заявку не змінено", "error")
+
+    # Список вхідних слухає подію documentsChanged і перезавантажується з поточними фільтрами
+    return trigger_toast(HttpResponse(), f"Змінено заявок: {changed}", events={'documentsChanged': True})
+
 @login_required
 def add_comment(request, pk):
     document = get_object_or_404(Document, pk=pk)
@@ -202,34 +317,42 @@ def add_comment(request, pk):
         
         # Перевіряємо, чи є текст
         if text and text.strip():
-            Comment.objects.create(
-                document=document,
-                user=request.user, 
-                text=text
-            )
-            
-            # Отримуємо оновлений список коментарів
-            comments = document.comments.select_related('user').order_by('-created_at')
+            comment = services.add_comment(document, request.user, text)
             
-            # Рендеримо список
-            response = render(request, "documents/partials/comments_list.html", {'comments': comments})
+            # Повертаємо лише новий коментар — він додається на початок списку
+            response = render(request, "documents/partials/comment_added.html", {'comment': comment})
             
             # Чіпляємо повідомлення про успіх
             return trigger_toast(response, "Коментар додано")
         
         else:
-            # Якщо текст порожній - повертаємо старий список (або нічого) і помилку
-            comments = document.comments.select_related('user').order_by('-created_at')
-            response = render(request, "documents/partials/comments_list.html", {'comments': comments})
-            return trigger_toast(response, "Коментар не може бути порожнім", "error")
+            # Якщо текст порожній - список не змінюється, лише повідомлення про помилку
+            return trigger_toast(HttpResponse(), "Коментар не може бути порожнім", "error")
     
     # GET-запит (відкриття модалки)
     return render(request, "documents/partials/comment_modal.html", {'document': document})
 
+@login_required
+def document_comments(request, pk):
+    """Наступна сторінка коментарів (нескінченна прокрутка на сторінці заявки)"""
+    comments = Comment.objects.filter(document_id=pk).select_related('user')
+    page = KeysetPaginator(comments, COMMENTS_PAGE_SIZE).get_page(request.GET.get('cursor'))
+    return render(request, "documents/partials/comments_page.html", {'page': page, 'document_id': pk})
+
+@login_required
+def document_history(request, pk):
+    """Наступна сторінка історії змін (нескінченна прокрутка на сторінці заявки)"""
+    history = DocumentHistory.objects.filter(document_id=pk).select_related('user')
+    page = KeysetPaginator(history, HISTORY_PAGE_SIZE).get_page(request.GET.get('cursor'))
+    return render(request, "documents/partials/history_page.html", {'page': page, 'document_id': pk})
+
 @login_required
 def document_files(request, pk):
     document = get_object_or_404(Document, pk=pk)
-    files = document.attachments.select_related('uploaded_by').order_by('-uploaded_at')
+    return render_files(request, document)
+
+def render_files(request, document):
+    files = document.attachments.select_related('uploaded_by').defer('text').order_by('-uploaded_at')
     
     return render(request, 'documents/partials/files_list.html', {
         'document': document, 
@@ -242,31 +365,178 @@ def upload_file(request, pk):
     document = get_object_or_404(Document, pk=pk)
     
     if 'file' in request.FILES:
-        file = request.FILES['file']
-        Attachment.objects.create(
-            document=document,
-            file=file,
-            uploaded_by=request.user,
-            filename=file.name
-        )
+        services.add_attachment(document, request.FILES['file'], request.user)
         # Оновлюємо список і кажемо "Успіх"
-        response = document_files(request, pk)
+        response = render_files(request, document)
         return trigger_toast(response, "Файл успішно завантажено")
     
     # Якщо помилка
-    response = document_files(request, pk)
+    response = render_files(request, document)
     return trigger_toast(response, "Помилка завантаження файлу", "error")
 
+# --- Завантаження великих файлів частинами (див. uploads.py) ---
+
+def upload_state(session):
+    return {
+        'id': str(session.pk),
+        'offset': session.received,
+        'size': session.size,
+        'chunk_size': uploads.max_chunk_size(),
+    }
+
+@login_required
+@require_POST
+def upload_start(request, pk):
+    document = get_object_or_404(Document, pk=pk)
+    try:
+        session = uploads.start(document, request.user, request.POST.get('filename'), request.POST.get('size'))
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    return JsonResponse(upload_state(session), status=201)
+
+@login_required
+def upload_chunk(request, upload_id):
+    """GET — скільки байтів уже отримано, PUT ?offset=N — чергова частина, DELETE — скасування"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+
+    if request.method in ('GET', 'HEAD'):
+        return JsonResponse(upload_state(session))
+
+    if request.method == 'DELETE':
+        uploads.discard(session)
+        return HttpResponse(status=204)
+
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['GET', 'HEAD', 'PUT', 'DELETE'])
+
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        uploads.write_chunk(session, offset, request, length)
+    except ValueError:
+        return JsonResponse({'error': "Некоректний offset"}, status=400)
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc), **upload_state(session)}, status=exc.status)
+    return JsonResponse(upload_state(session))
+
+@login_required
+@require_POST
+def upload_complete(request, upload_id):
+    session = get_object_or_404(UploadSession.objects.select_related('document', 'user'), pk=upload_id, user=request.user)
+    try:
+        attachment = uploads.complete(session)
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc), **upload_state(session)}, status=exc.status)
+    return JsonResponse({'attachment': attachment.pk, 'filename': attachment.filename}, status=201)
+
+@login_required
+@require_safe
+def download_file(request, pk):
+    attachment = get_object_or_404(Attachment.objects.defer('text'), pk=pk)
+    if attachment.scan_status == 'infected':
+        return HttpResponseForbidden("Файл не пройшов перевірку на віруси")
+    return serve_file(request, attachment.file, attachment.filename, as_attachment='download' in request.GET)
+
+@login_required
+@require_safe
+def attachment_thumbnail(request, pk):
+    attachment = get_object_or_404(Attachment.objects.only('id', 'thumbnail'), pk=pk)
+    if not attachment.thumbnail:
+        raise Http404
+    return serve_file(request, attachment.thumbnail)
+
+@staff_member_required
+def job_stats(request):
+    """Стан черги фонових задач і пропускна здатність за останню годину"""
+    return JsonResponse(jobs.stats())
+
+@staff_member_required
+def request_metrics(request):
+    """Ковзні агрегати метрик запитів по маршрутах цього процесу (metrics.py)"""
+    return JsonResponse({'window': metrics.window(), 'views': metrics.store.aggregates()})
+
+@login_required
+@require_safe
+def download_document_file(request, pk):
+    document = get_object_or_404(Document.objects.only('id', 'file'), pk=pk)
+    if not document.file:
+        raise Http404
+    return serve_file(request, document.file, as_attachment='download' in request.GET)
+
 @login_required
 @require_POST
 def delete_file(request, pk):
-    attachment = get_object_or_404(Attachment, pk=pk)
-    doc_id = attachment.document.id # Запам'ятовуємо ID документа, щоб повернутися
+    # Заявку беремо разом із вкладенням, щоб повернутися до її списку файлів
+    attachment = get_object_or_404(Attachment.objects.select_related('document'), pk=pk)
     
-    # Видаляємо
-    attachment.file.delete()
-    attachment.delete()
+    # Видаляємо запис (разом з лічильником заявки); файл зникне з диска з останнім посиланням на нього
+    services.delete_attachment(attachment)
     
     # Повертаємо оновлений список
-    response = document_files(request, doc_id)
-    return trigger_toast(response, "Файл видалено")
\ No newline at end of file
+    response = render_files(request, attachment.document)
+    return trigger_toast(response, "Файл видалено")
+
+
+# --- Архів закритих заявок (лише перегляд; перенесення — команда archive_documents) ---
+
+@login_required
+def archive_list(request):
+    documents = ArchivedDocument.objects.select_related('department')
+    query = request.GET.get('q', '').strip()
+    if query:
+        lookup = prefix_filter(query)
+        if lookup is not None:
+            documents = documents.filter(lookup)
+        else:
+            documents = documents.filter(full_name__icontains=query)
+    department = request.GET.get('department')
+    if department and department.isdigit():
+        documents = documents.filter(department_id=department)
+
+    page_obj = KeysetPaginator(documents, ARCHIVE_PAGE_SIZE).get_page(request.GET.get('cursor'))
+    context = {
+        'page_obj': page_obj,
+        'documents': page_obj,
+        'departments': departments.all(),
+    }
+    if request.headers.get('HX-Request'):
+        template = "documents/archive_content.html"
+    else:
+        template = "documents/archive_list.html"
+    return render(request, template, context)
+
+@login_required
+def archive_detail(request, pk):
+    document = get_object_or_404(ArchivedDocument.objects.select_related('created_by', 'department'), pk=pk)
+    context = {
+        'document': document,
+        'comments': document.comments.select_related('user'),
+        'history': document.history.select_related('user'),
+        'files': document.attachments.defer('text').select_related('uploaded_by'),
+    }
+    return render(request, "documents/archive_detail_content.html", context)
+
+@staff_member_required
+@require_POST
+def archive_restore(request, pk):
+    if not archive.restore([pk]):
+        raise Http404
+    # Фрагмент сторінки заявки без умовного GET: це відповідь на POST
+    response = render_document_detail(request, get_object_or_404(Document, pk=pk))
+    return trigger_toast(response, "Заявку повернено з архіву")
+
+@login_required
+@require_safe
+def archive_file(request, pk):
+    attachment = get_object_or_404(ArchivedAttachment.objects.defer('text'), pk=pk)
+    if attachment.scan_status == 'infected':
+        return HttpResponseForbidden("Файл не пройшов перевірку на віруси")
+    return serve_file(request, attachment.file, attachment.filename, as_attachment='download' in request.GET)
+
+@login_required
+@require_safe
+def archive_document_file(request, pk):
+    document = get_object_or_404(ArchivedDocument.objects.only('id', 'file'), pk=pk)
+    if not document.file:
+        raise Http404
+    return serve_file(request, document.file, as_attachment='download' in request.GET)